@@ -1,21 +1,51 @@
-from fastapi import FastAPI, HTTPException, Depends, Request, Response, APIRouter
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, APIRouter, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+from pymongo import monitoring
 from dotenv import load_dotenv
 from pathlib import Path
+from urllib.parse import urlsplit
+from email.utils import format_datetime, parsedate_to_datetime
 import os
 import logging
 import uuid
+import hashlib
+import hmac
+import base64
+import json
+import csv
+import io
+import gzip
+import zlib
 import jwt
 import httpx
+import websockets
+import orjson
 import asyncio
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+import time
+import random
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any, Tuple
+from dataclasses import dataclass
+from collections import OrderedDict
 from pydantic import BaseModel, Field
 
+try:
+    import brotli
+except ImportError:  # Optional, responses fall back to gzip
+    brotli = None
+
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -30,15 +60,701 @@ DB_NAME = os.environ.get('DB_NAME')
 DISCORD_GUILD_ID = os.environ.get('DISCORD_GUILD_ID')
 DISCORD_BOT_TOKEN = os.environ.get('DISCORD_BOT_TOKEN')
 
+# Discord HTTP client settings
+DISCORD_API_BASE = os.environ.get('DISCORD_API_BASE', 'https://discord.com/api/v10')
+DISCORD_HTTP2 = os.environ.get('DISCORD_HTTP2', 'true').lower() == 'true'
+DISCORD_HTTP_MAX_CONNECTIONS = int(os.environ.get('DISCORD_HTTP_MAX_CONNECTIONS', '100'))
+DISCORD_HTTP_MAX_KEEPALIVE = int(os.environ.get('DISCORD_HTTP_MAX_KEEPALIVE', '20'))
+DISCORD_HTTP_KEEPALIVE_EXPIRY = float(os.environ.get('DISCORD_HTTP_KEEPALIVE_EXPIRY', '30'))
+DISCORD_HTTP_TIMEOUT = float(os.environ.get('DISCORD_HTTP_TIMEOUT', '10'))
+DISCORD_HTTP_CONNECT_TIMEOUT = float(os.environ.get('DISCORD_HTTP_CONNECT_TIMEOUT', '5'))
+DISCORD_STATS_CALL_TIMEOUT = float(os.environ.get('DISCORD_STATS_CALL_TIMEOUT', '5'))
+
+# Discord rate limit scheduling
+DISCORD_RATE_LIMIT_GLOBAL = int(os.environ.get('DISCORD_RATE_LIMIT_GLOBAL', '50'))
+DISCORD_RATE_LIMIT_MAX_WAIT = float(os.environ.get('DISCORD_RATE_LIMIT_MAX_WAIT', '10'))
+DISCORD_RATE_LIMIT_MAX_RETRIES = int(os.environ.get('DISCORD_RATE_LIMIT_MAX_RETRIES', '3'))
+DISCORD_RATE_LIMIT_BUCKETS = int(os.environ.get('DISCORD_RATE_LIMIT_BUCKETS', '10000'))
+
+# Discord Gateway listener, keeps guild counts current from bot events instead of REST polling
+DISCORD_GATEWAY_ENABLED = os.environ.get('DISCORD_GATEWAY_ENABLED', 'false').lower() == 'true'
+DISCORD_GATEWAY_URL = os.environ.get('DISCORD_GATEWAY_URL', 'wss://gateway.discord.gg/?v=10&encoding=json')
+DISCORD_GATEWAY_PUBLISH_INTERVAL = float(os.environ.get('DISCORD_GATEWAY_PUBLISH_INTERVAL', '1'))
+
+# Write-behind batching of login updates for returning users
+LOGIN_WRITE_BEHIND = os.environ.get('LOGIN_WRITE_BEHIND', 'true').lower() == 'true'
+LOGIN_FLUSH_INTERVAL = float(os.environ.get('LOGIN_FLUSH_INTERVAL', '1'))
+LOGIN_FLUSH_MAX_PENDING = int(os.environ.get('LOGIN_FLUSH_MAX_PENDING', '500'))
+
+# Guild membership cache settings
+MEMBERSHIP_CACHE_TTL = float(os.environ.get('MEMBERSHIP_CACHE_TTL', '600'))
+MEMBERSHIP_CACHE_SIZE = int(os.environ.get('MEMBERSHIP_CACHE_SIZE', '10000'))
+
+# Self-contained JWT mode: tokens carry profile and admin claims plus a token version
+JWT_CLAIMS_MODE = os.environ.get('JWT_CLAIMS_MODE', 'false').lower() == 'true'
+TOKEN_VERSION_CACHE_TTL = float(os.environ.get('TOKEN_VERSION_CACHE_TTL', '60'))
+
+# Verified token cache settings
+TOKEN_CACHE_TTL = float(os.environ.get('TOKEN_CACHE_TTL', '3600'))
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '10000'))
+
+# Authenticated user cache settings
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '60'))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '5000'))
+
+# Server stats cache settings (seconds)
+STATS_CACHE_TTL = float(os.environ.get('STATS_CACHE_TTL', '30'))
+STATS_CACHE_STALE_TTL = float(os.environ.get('STATS_CACHE_STALE_TTL', '300'))
+
+# Cache-Control max-age of GET /api/stats, clients and proxies revalidate with the ETag afterwards
+STATS_HTTP_MAX_AGE = int(os.environ.get('STATS_HTTP_MAX_AGE', '5'))
+
+# Background stats refresher settings (seconds)
+STATS_REFRESH_ENABLED = os.environ.get('STATS_REFRESH_ENABLED', 'true').lower() == 'true'
+STATS_REFRESH_INTERVAL = float(os.environ.get('STATS_REFRESH_INTERVAL', '30'))
+STATS_REFRESH_MAX_BACKOFF = float(os.environ.get('STATS_REFRESH_MAX_BACKOFF', '300'))
+
+# Server-Sent Events stats stream settings
+STATS_STREAM_HEARTBEAT = float(os.environ.get('STATS_STREAM_HEARTBEAT', '15'))
+STATS_STREAM_QUEUE_SIZE = int(os.environ.get('STATS_STREAM_QUEUE_SIZE', '8'))
+
+# Response compression, brotli needs the optional brotli package
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get('COMPRESSION_MINIMUM_SIZE', '500'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+
+# Prometheus metrics at /metrics: request, Discord and MongoDB latency histograms
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+# Bearer token scrapers must send, the backend port is published so /metrics stays off without one
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Request tracing: spans around Discord calls and MongoDB commands, waterfalls of slow requests in the log
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'true').lower() == 'true'
+TRACE_LOG_THRESHOLD = float(os.environ.get('TRACE_LOG_THRESHOLD', '1'))
+TRACE_EXPORT_FILE = os.environ.get('TRACE_EXPORT_FILE')
+TRACE_EXPORT_URL = os.environ.get('TRACE_EXPORT_URL')
+TRACE_EXPORT_INTERVAL = float(os.environ.get('TRACE_EXPORT_INTERVAL', '5'))
+TRACE_EXPORT_MAX_QUEUE = int(os.environ.get('TRACE_EXPORT_MAX_QUEUE', '10000'))
+
+# Create the users indexes on startup
+MONGO_ENSURE_INDEXES = os.environ.get('MONGO_ENSURE_INDEXES', 'true').lower() == 'true'
+
+# Users listing page sizes
+USERS_PAGE_SIZE = int(os.environ.get('USERS_PAGE_SIZE', '100'))
+USERS_PAGE_MAX = int(os.environ.get('USERS_PAGE_MAX', '500'))
+USERS_EXPORT_BATCH_SIZE = int(os.environ.get('USERS_EXPORT_BATCH_SIZE', '500'))
+
+# Admin dashboard summary document refresh interval (seconds, 0 disables it)
+USERS_SUMMARY_INTERVAL = float(os.environ.get('USERS_SUMMARY_INTERVAL', '60'))
+ADMIN_RECENT_USERS = 10
+
 # Admin user IDs
 ADMIN_USER_IDS = ["449682043404812288"]
 
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a Prometheus label set"""
+    pairs = [
+        f'{name}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    """Prometheus histogram keeping one series per label values tuple"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts with a final +Inf slot, sum, count]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        # MongoDB listeners observe from Motor's executor threads
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        """Record one observation, in seconds"""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        """Get the exposition lines, with cumulative buckets"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(series):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+class Gauge:
+    """Prometheus gauge without labels, only touched from the event loop"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+
+    def render(self) -> List[str]:
+        """Get the exposition lines"""
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {self.value}"]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request duration by route template.",
+    ("method", "route", "status"), LATENCY_BUCKETS
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served, including open streams.")
+discord_request_duration = Histogram(
+    "discord_request_duration_seconds", "Discord API call duration by route and status, excluding rate limit waits.",
+    ("endpoint", "status"), LATENCY_BUCKETS
+)
+mongo_command_duration = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command duration as reported by the driver.",
+    ("command", "collection", "status"), MONGO_LATENCY_BUCKETS
+)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Records MongoDB command durations from pymongo command events"""
+
+    def __init__(self):
+        # request id -> collection, the reply events do not carry the command
+        self._collections: Dict[int, str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        collection = event.command.get(event.command_name)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_command_duration.observe((event.command_name, collection, "ok"), event.duration_micros / 1_000_000)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_command_duration.observe((event.command_name, collection, "failed"), event.duration_micros / 1_000_000)
+
+class Span:
+    """One timed operation within a request trace"""
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start", "end", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, kind: str = "internal",
+                 attributes: Optional[Dict[str, Any]] = None, start: Optional[float] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time() if start is None else start
+        self.end: Optional[float] = None
+        self.attributes = attributes or {}
+        self.error = False
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.time()) - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the span as one JSON-lines export record"""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": int(self.start * 1e9),
+            "end_time_unix_nano": int((self.end or self.start) * 1e9),
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "status": "error" if self.error else "ok",
+        }
+
+class Trace:
+    """Spans collected while serving one request, shared by every task the request spawns"""
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+current_span_id: ContextVar[Optional[str]] = ContextVar("current_span_id", default=None)
+
+@contextmanager
+def trace_span(name: str, kind: str = "internal", **attributes):
+    """Time a block as a child of the current span, a no-op outside traced requests"""
+    trace = current_trace.get()
+    if trace is None:
+        yield None
+        return
+    span = Span(trace.trace_id, current_span_id.get(), name, kind, attributes)
+    token = current_span_id.set(span.span_id)
+    try:
+        yield span
+    except BaseException:
+        span.error = True
+        raise
+    finally:
+        span.end = time.time()
+        current_span_id.reset(token)
+        trace.spans.append(span)
+
+def record_span(name: str, start: float, end: float, kind: str = "internal", error: bool = False, **attributes):
+    """Add an already finished span under the current span"""
+    trace = current_trace.get()
+    if trace is None:
+        return
+    span = Span(trace.trace_id, current_span_id.get(), name, kind, attributes, start)
+    span.end = end
+    span.error = error
+    trace.spans.append(span)
+
+class MongoCommandSpans(monitoring.CommandListener):
+    """Adds a span per MongoDB command, Motor runs commands in its executor with the request's context"""
+
+    def __init__(self):
+        self._pending: Dict[int, Tuple[Trace, Span]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        trace = current_trace.get()
+        if trace is None:
+            return
+        collection = event.command.get(event.command_name)
+        collection = collection if isinstance(collection, str) else ""
+        span = Span(trace.trace_id, current_span_id.get(), f"mongodb {event.command_name} {collection}".rstrip(),
+                    "client", {"db.operation": event.command_name, "db.collection": collection})
+        self._pending[event.request_id] = (trace, span)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event.request_id, event.duration_micros, False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event.request_id, event.duration_micros, True)
+
+    def _finish(self, request_id: int, duration_micros: int, error: bool):
+        pending = self._pending.pop(request_id, None)
+        if pending is None:
+            return
+        trace, span = pending
+        span.end = span.start + duration_micros / 1_000_000
+        span.error = error
+        trace.spans.append(span)
+
+def render_metrics() -> str:
+    """Render every metric in the Prometheus text format"""
+    lines = []
+    for metric in (http_request_duration, http_requests_in_flight, discord_request_duration, mongo_command_duration):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
 # MongoDB connection
-client = AsyncIOMotorClient(MONGO_URL)
+mongo_listeners = [MongoCommandMetrics()] if METRICS_ENABLED else []
+if TRACING_ENABLED:
+    mongo_listeners.append(MongoCommandSpans())
+client = AsyncIOMotorClient(MONGO_URL, event_listeners=mongo_listeners)
 db = client[DB_NAME]
 
+# Indexes required by the users queries: (keys, options)
+USER_INDEXES = [
+    ([("id", ASCENDING)], {"name": "id_unique", "unique": True}),
+    ([("joined_at", DESCENDING), ("id", DESCENDING)], {"name": "joined_at_id_desc"}),
+    ([("is_admin", ASCENDING)], {"name": "is_admin"}),
+]
+
+# Stable users listing order, matching the joined_at_id_desc index
+USERS_SORT = [("joined_at", DESCENDING), ("id", DESCENDING)]
+
+# Background task refreshing the cached users summary document
+users_summary_task: Optional[asyncio.Task] = None
+
+# Shared Discord HTTP client, opened on startup and closed on shutdown
+discord_http: Optional[httpx.AsyncClient] = None
+
+def orjson_default(value: Any) -> Any:
+    """Serialize Pydantic models for orjson, which handles datetimes itself"""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson
+
+    Returning it directly from a route also skips FastAPI's jsonable_encoder pass.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=orjson_default)
+
+# Content types that are already compressed or must reach the client unbuffered
+COMPRESSION_EXCLUDED_TYPES = ("text/event-stream", "image/", "audio/", "video/", "application/zip", "application/gzip")
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, None for identity"""
+    qualities = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip()] = quality
+    
+    # Server preference breaks ties, brotli first when it is installed
+    best, best_quality = None, 0.0
+    for encoding in ("br", "gzip") if brotli is not None else ("gzip",):
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """Compress a whole body"""
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+class StreamCompressor:
+    """Incremental br or gzip compressor for streamed bodies"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+            self.compress = self._compressor.process
+            self.finish = self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress = self._compressor.compress
+            self.finish = self._compressor.flush
+
+class CompressionMiddleware:
+    """Compresses responses above a size threshold with the encoding the client prefers"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        encoding = None
+        if scope["type"] == "http":
+            encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start: Optional[Message] = None
+        compressor: Optional[StreamCompressor] = None
+        passthrough = False
+        
+        async def send_compressed(message: Message):
+            nonlocal start, compressor, passthrough
+            if passthrough or message["type"] not in ("http.response.start", "http.response.body"):
+                await send(message)
+                return
+            
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if "content-encoding" in headers or headers.get("content-type", "").startswith(COMPRESSION_EXCLUDED_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Hold the headers until the first body chunk shows whether compression pays off
+                    start = message
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                
+                if not more_body:
+                    body = compress_body(body, encoding)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                
+                del headers["Content-Length"]
+                compressor = StreamCompressor(encoding)
+                await send(start)
+            
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+        
+        await self.app(scope, receive, send_compressed)
+
+class RequestMetricsMiddleware:
+    """Records request durations by route template and the number of requests in flight"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status = 500
+        
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        http_requests_in_flight.value += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.value -= 1
+            # The router leaves the matched route in the scope, raw paths would explode the label set
+            route = scope.get("route")
+            http_request_duration.observe(
+                (scope["method"], route.path if route is not None else "unmatched", str(status)),
+                time.perf_counter() - started
+            )
+
+def parse_traceparent(value: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Get the trace id and parent span id of a W3C traceparent header"""
+    parts = (value or "").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    return parts[1], parts[2]
+
+def format_waterfall(trace: Trace, root: Span, width: int = 40) -> str:
+    """Render a trace as one line per span, indented by depth, with a timeline bar"""
+    by_id = {span.span_id: span for span in trace.spans}
+    
+    def depth(span: Span) -> int:
+        level = 0
+        while span.parent_id in by_id:
+            span = by_id[span.parent_id]
+            level += 1
+        return level
+    
+    total = max(root.duration, 1e-6)
+    lines = [f"Trace {trace.trace_id} {root.name} {root.attributes.get('http.status_code')} {total * 1000:.1f}ms"]
+    for span in sorted(trace.spans, key=lambda span: span.start):
+        offset = max(span.start - root.start, 0.0)
+        left = min(int(offset / total * width), width - 1)
+        bar = min(max(1, round(span.duration / total * width)), width - left)
+        lines.append(
+            f"  {offset * 1000:8.1f}ms {span.duration * 1000:8.1f}ms "
+            f"|{' ' * left}{'#' * bar}{' ' * (width - left - bar)}| "
+            f"{'  ' * depth(span)}{span.name}{' (error)' if span.error else ''}"
+        )
+    return "\n".join(lines)
+
+class TracingMiddleware:
+    """Opens a trace per request, then exports its spans and logs slow ones as a waterfall, streams excepted"""
+
+    def __init__(self, app: ASGIApp, log_threshold: float):
+        self.app = app
+        self.log_threshold = log_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        # Join the caller's trace when it sends a traceparent header
+        trace_id, parent_id = parse_traceparent(Headers(scope=scope).get("traceparent"))
+        trace = Trace(trace_id or os.urandom(16).hex())
+        root = Span(trace.trace_id, parent_id, f"{scope['method']} {scope['path']}", "server", {"http.method": scope["method"]})
+        
+        async def send_with_trace_id(message: Message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                if Headers(raw=message.get("headers", [])).get("content-type", "").startswith("text/event-stream"):
+                    root.attributes["http.streamed"] = True
+                message["headers"] = [*message.get("headers", []), (b"x-trace-id", trace.trace_id.encode())]
+            elif message["type"] == "http.response.body" and message.get("more_body"):
+                root.attributes["http.streamed"] = True
+            await send(message)
+        
+        trace_token = current_trace.set(trace)
+        span_token = current_span_id.set(root.span_id)
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        except BaseException:
+            root.error = True
+            raise
+        finally:
+            current_span_id.reset(span_token)
+            current_trace.reset(trace_token)
+            root.end = time.time()
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope['method']} {route.path}"
+            trace.spans.insert(0, root)
+            trace_exporter.export(trace.spans)
+            # A stream lasts as long as its client stays connected, its duration says nothing about latency
+            if root.duration >= self.log_threshold and not root.attributes.get("http.streamed"):
+                logger.info(format_waterfall(trace, root))
+
+class TraceExporter:
+    """Batches finished spans to a JSON-lines file and/or an OTLP/HTTP JSON collector"""
+
+    # OTLP SpanKind values
+    OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+    def __init__(self, path: Optional[str], url: Optional[str], interval: float, max_queue: int):
+        self.path = path
+        self.url = url
+        self.interval = interval
+        self.max_queue = max_queue
+        self._queue: List[Span] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._http: Optional[httpx.AsyncClient] = None
+        self.exported = 0
+        self.dropped = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path or self.url)
+
+    def export(self, spans: List[Span]):
+        """Queue the spans of a finished request, dropping them once the queue is full"""
+        if not self.enabled:
+            return
+        room = max(self.max_queue - len(self._queue), 0)
+        if len(spans) > room:
+            self.dropped += len(spans) - room
+            spans = spans[:room]
+        self._queue.extend(spans)
+
+    def start(self):
+        """Launch the export loop"""
+        if self.enabled and self._task is None:
+            if self.url:
+                self._http = httpx.AsyncClient(timeout=httpx.Timeout(5.0))
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the export loop once its current export is done and send everything still queued"""
+        if self._task is not None:
+            # Wake the loop rather than cancel it, a cancelled flush would lose the batch it took
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def flush(self):
+        """Write queued spans to every configured destination"""
+        if not self._queue:
+            return
+        batch, self._queue = self._queue, []
+        try:
+            if self.path:
+                lines = b"".join(orjson.dumps(span.to_dict(), default=str) + b"\n" for span in batch)
+                await asyncio.to_thread(self._append, lines)
+            if self.url and self._http is not None:
+                response = await self._http.post(self.url, content=orjson.dumps(self.to_otlp(batch)),
+                                                 headers={"Content-Type": "application/json"})
+                response.raise_for_status()
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error exporting {len(batch)} spans: {e}")
+            return
+        self.exported += len(batch)
+
+    def to_otlp(self, batch: List[Span]) -> Dict[str, Any]:
+        """Encode spans as an OTLP/HTTP JSON ExportTraceServiceRequest"""
+        def attribute(key: str, value: Any) -> Dict[str, Any]:
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+        
+        return {"resourceSpans": [{
+            "resource": {"attributes": [attribute("service.name", "fdm-community-api")]},
+            "scopeSpans": [{
+                "scope": {"name": "fdm-community"},
+                "spans": [{
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": self.OTLP_KINDS.get(span.kind, 1),
+                    "startTimeUnixNano": str(int(span.start * 1e9)),
+                    "endTimeUnixNano": str(int((span.end or span.start) * 1e9)),
+                    "attributes": [attribute(key, value) for key, value in span.attributes.items()],
+                    "status": {"code": 2 if span.error else 1},
+                } for span in batch],
+            }],
+        }]}
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get export counters"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queued": len(self._queue),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+    def _append(self, lines: bytes):
+        with open(self.path, "ab") as f:
+            f.write(lines)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+trace_exporter = TraceExporter(
+    path=TRACE_EXPORT_FILE,
+    url=TRACE_EXPORT_URL,
+    interval=TRACE_EXPORT_INTERVAL,
+    max_queue=TRACE_EXPORT_MAX_QUEUE
+)
+
 # Create the main app
-app = FastAPI(title="FDM Community API", version="1.0.0")
+app = FastAPI(title="FDM Community API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -55,6 +771,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress responses for clients that accept it
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
+# Measure every request, added after compression so it runs outside it and the timings include it
+if METRICS_ENABLED:
+    app.add_middleware(RequestMetricsMiddleware)
+
+# Trace every request, spans are only kept while a trace is active; added last, so this is the
+# outermost middleware: Tracing > RequestMetrics > Compression > CORS > Session
+if TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware, log_threshold=TRACE_LOG_THRESHOLD)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -73,6 +802,29 @@ class User(BaseModel):
     joined_at: datetime = Field(default_factory=datetime.utcnow)
     last_login: datetime = Field(default_factory=datetime.utcnow)
 
+# Projection returning exactly the User fields, without _id or internal fields like token_version
+USER_PROJECTION = {"_id": 0, **{field: 1 for field in User.model_fields}}
+
+@dataclass
+class UserRecord:
+    """Slotted read-only counterpart of User for documents this app wrote itself"""
+    __slots__ = tuple(User.model_fields)
+    id: str
+    username: str
+    discriminator: str
+    avatar: Optional[str]
+    email: Optional[str]
+    is_admin: bool
+    joined_at: datetime
+    last_login: datetime
+
+# Defaults for User fields that older documents may lack
+USER_DOC_DEFAULTS = {"avatar": None, "email": None, "is_admin": False}
+
+def user_from_doc(user_doc: Dict[str, Any]) -> UserRecord:
+    """Build a UserRecord from a users document, skipping Pydantic validation"""
+    return UserRecord(**{**USER_DOC_DEFAULTS, **user_doc})
+
 class UserCreate(BaseModel):
     discord_id: str
     username: str
@@ -86,68 +838,665 @@ class ServerStats(BaseModel):
     boost_count: int
     channel_count: int
     role_count: int
+    degraded: bool = False
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class LoginResponse(BaseModel):
     access_token: str
     user: User
 
+class LRUTTLCache:
+    """Bounded LRU cache whose entries also expire after a TTL"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Get a live entry and mark it as recently used"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None):
+        """Store an entry, evicting the least recently used ones beyond max_size"""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Any):
+        """Drop an entry if present"""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Drop every entry"""
+        self._data.clear()
+
+    def items(self) -> List[Tuple[Any, Any]]:
+        """Get live entries without touching recency or counters"""
+        now = time.monotonic()
+        return [(key, value) for key, (expires_at, value) in self._data.items() if expires_at > now]
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get size, hit ratio and eviction counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+# Positive guild membership results, keyed by Discord user id
+membership_cache = LRUTTLCache(max_size=MEMBERSHIP_CACHE_SIZE, ttl=MEMBERSHIP_CACHE_TTL)
+
+# Authenticated User objects, keyed by user id
+user_cache = LRUTTLCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# Claims of already verified JWTs, keyed by token digest and expiring with the token
+token_cache = LRUTTLCache(max_size=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
+# Current token version per user id, -1 once the user has been deleted
+token_versions = LRUTTLCache(max_size=USER_CACHE_SIZE, ttl=TOKEN_VERSION_CACHE_TTL)
+
 # Utility functions
-def create_access_token(user_id: str) -> str:
+def create_discord_http_client() -> httpx.AsyncClient:
+    """Create the pooled keep-alive client used for all Discord API calls"""
+    return httpx.AsyncClient(
+        base_url=DISCORD_API_BASE,
+        http2=DISCORD_HTTP2,
+        limits=httpx.Limits(
+            max_connections=DISCORD_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=DISCORD_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=DISCORD_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(DISCORD_HTTP_TIMEOUT, connect=DISCORD_HTTP_CONNECT_TIMEOUT),
+    )
+
+def get_discord_http() -> httpx.AsyncClient:
+    """Get the shared Discord HTTP client, creating it if startup has not run yet"""
+    global discord_http
+    if discord_http is None or discord_http.is_closed:
+        discord_http = create_discord_http_client()
+    return discord_http
+
+# JSON error code of a member lookup for a user who is not in the guild
+DISCORD_UNKNOWN_MEMBER = 10007
+
+def discord_error_code(response: httpx.Response) -> Optional[int]:
+    """Get the JSON error code of a Discord error response, None if the body has none"""
+    try:
+        return response.json().get("code")
+    except (ValueError, AttributeError):
+        return None
+
+# Path segments whose id is part of the rate limit bucket, other ids share one bucket per route
+DISCORD_MAJOR_PARAMETERS = {"guilds", "channels", "webhooks"}
+
+def discord_route(method: str, path: str) -> Tuple[str, str]:
+    """Split a Discord API path into its route template and major parameters"""
+    parts = path.split("?")[0].strip("/").split("/")
+    major = []
+    for i, part in enumerate(parts):
+        if part.isdigit():
+            if i > 0 and parts[i - 1] in DISCORD_MAJOR_PARAMETERS:
+                major.append(part)
+            parts[i] = "{id}"
+    return f"{method} /{'/'.join(parts)}", "/".join(major)
+
+class DiscordRateLimited(HTTPException):
+    """Raised when a Discord call would wait longer than DISCORD_RATE_LIMIT_MAX_WAIT"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail="Discord rate limit reached, try again later",
+            headers={"Retry-After": str(int(retry_after) + 1)}
+        )
+        self.retry_after = retry_after
+
+class RateLimitBucket:
+    """State of one Discord rate limit bucket, from the X-RateLimit-* headers"""
+    __slots__ = ("limit", "remaining", "reset_at", "reset_after", "waiting", "lock")
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.reset_after = 0.0
+        self.waiting = 0
+        self.lock = asyncio.Lock()
+
+class DiscordRateLimiter:
+    """Queues Discord API calls so they stay within per-route buckets and the global limit"""
+
+    def __init__(self, global_limit: int, max_wait: float, max_retries: int, max_buckets: int):
+        self.global_limit = global_limit
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        # Route template -> bucket hash announced by Discord in X-RateLimit-Bucket
+        self._route_hashes: Dict[str, str] = {}
+        # Idle buckets are dropped once they have long since reset
+        self._buckets = LRUTTLCache(max_size=max_buckets, ttl=600)
+        self._global_reset_at = 0.0
+        self._window_start = 0.0
+        self._window_count = 0
+        self.requests = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self.rate_limited = 0
+        self.global_rate_limited = 0
+        self.rejected = 0
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a Discord API request once its bucket allows it, retrying on 429"""
+        authorization = (kwargs.get("headers") or {}).get("Authorization", "")
+        is_bot = authorization.startswith("Bot ")
+        # OAuth bearer routes are limited per user token, keep one bucket per token
+        owner = hashlib.sha256(authorization.encode()).hexdigest()[:16] if authorization.startswith("Bearer ") else ""
+        route, major = discord_route(method, path)
+        
+        for attempt in range(self.max_retries + 1):
+            queued_at = time.time()
+            bucket = await self._acquire(route, major, owner, is_bot)
+            sent_at = time.time()
+            if sent_at - queued_at > 0.001:
+                record_span("rate limit wait", queued_at, sent_at, route=route)
+            
+            self.requests += 1
+            started = time.perf_counter()
+            try:
+                response = await get_discord_http().request(method, path, **kwargs)
+            except Exception:
+                discord_request_duration.observe((route, "error"), time.perf_counter() - started)
+                record_span(f"HTTP {route}", sent_at, time.time(), "client", error=True, attempt=attempt + 1)
+                raise
+            discord_request_duration.observe((route, str(response.status_code)), time.perf_counter() - started)
+            record_span(f"HTTP {route}", sent_at, time.time(), "client", error=response.status_code >= 500,
+                        attempt=attempt + 1, status=response.status_code)
+            self._update(route, major, owner, response.headers)
+            if response.status_code != 429:
+                return response
+            
+            self.rate_limited += 1
+            retry_after = self._retry_after(response)
+            now = time.monotonic()
+            if response.headers.get("X-RateLimit-Global") == "true" and is_bot:
+                self.global_rate_limited += 1
+                self._global_reset_at = now + retry_after
+            else:
+                bucket.remaining = 0
+                bucket.reset_at = now + retry_after
+            logger.warning(f"Discord rate limited {route} (attempt {attempt + 1}), retry after {retry_after:.2f}s")
+        self.rejected += 1
+        raise DiscordRateLimited(retry_after)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get scheduler counters and the state of shared buckets"""
+        now = time.monotonic()
+        buckets = {}
+        user_buckets = 0
+        for key, bucket in self._buckets.items():
+            if key.endswith("|"):
+                buckets[key.rstrip("|")] = {
+                    "limit": bucket.limit,
+                    "remaining": bucket.remaining,
+                    "reset_in": round(max(bucket.reset_at - now, 0), 3),
+                    "queued": bucket.waiting,
+                }
+            else:
+                user_buckets += 1
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "rate_limited": self.rate_limited,
+            "global_rate_limited": self.global_rate_limited,
+            "rejected": self.rejected,
+            "global_reset_in": round(max(self._global_reset_at - now, 0), 3),
+            "routes": dict(self._route_hashes),
+            "buckets": buckets,
+            "user_buckets": user_buckets,
+        }
+
+    def _bucket(self, route: str, major: str, owner: str) -> Tuple[str, RateLimitBucket]:
+        key = f"{self._route_hashes.get(route, route)}|{major}|{owner}"
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = RateLimitBucket()
+            self._buckets.set(key, bucket)
+        return key, bucket
+
+    async def _acquire(self, route: str, major: str, owner: str, is_bot: bool) -> RateLimitBucket:
+        _, bucket = self._bucket(route, major, owner)
+        # The bucket lock queues callers in order while they wait for a reset
+        bucket.waiting += 1
+        async with bucket.lock:
+            bucket.waiting -= 1
+            while True:
+                now = time.monotonic()
+                wait = self._global_reset_at - now
+                if bucket.remaining == 0:
+                    wait = max(wait, bucket.reset_at - now)
+                if is_bot and self._window_count >= self.global_limit:
+                    wait = max(wait, self._window_start + 1 - now)
+                if wait <= 0:
+                    break
+                if wait > self.max_wait:
+                    self.rejected += 1
+                    raise DiscordRateLimited(wait)
+                self.throttled += 1
+                self.wait_seconds += wait
+                await asyncio.sleep(wait)
+            
+            if bucket.remaining == 0:
+                # Reset time has passed, open the next window locally so the queue does not drain
+                # all at once; headers of the responses correct it
+                bucket.remaining = bucket.limit
+                bucket.reset_at = now + bucket.reset_after
+            if bucket.remaining:
+                bucket.remaining -= 1
+            if is_bot:
+                if now - self._window_start >= 1:
+                    self._window_start = now
+                    self._window_count = 0
+                self._window_count += 1
+        return bucket
+
+    def _update(self, route: str, major: str, owner: str, headers: httpx.Headers):
+        bucket_hash = headers.get("X-RateLimit-Bucket")
+        if bucket_hash is None:
+            return
+        if self._route_hashes.get(route) != bucket_hash:
+            # Drop the placeholder bucket used before Discord announced the hash
+            self._buckets.invalidate(f"{self._route_hashes.get(route, route)}|{major}|{owner}")
+            self._route_hashes[route] = bucket_hash
+        key, bucket = self._bucket(route, major, owner)
+        try:
+            bucket.limit = int(headers["X-RateLimit-Limit"])
+            bucket.remaining = int(headers["X-RateLimit-Remaining"])
+            bucket.reset_after = float(headers["X-RateLimit-Reset-After"])
+            bucket.reset_at = time.monotonic() + bucket.reset_after
+        except (KeyError, ValueError):
+            return
+        self._buckets.set(key, bucket)
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float:
+        try:
+            return float(response.json()["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            return float(response.headers.get("Retry-After", "1"))
+
+discord_rate_limiter = DiscordRateLimiter(
+    global_limit=DISCORD_RATE_LIMIT_GLOBAL,
+    max_wait=DISCORD_RATE_LIMIT_MAX_WAIT,
+    max_retries=DISCORD_RATE_LIMIT_MAX_RETRIES,
+    max_buckets=DISCORD_RATE_LIMIT_BUCKETS
+)
+
+async def discord_request(method: str, path: str, **kwargs) -> httpx.Response:
+    """Send a Discord API request through the shared client and rate limiter"""
+    route, _ = discord_route(method, path)
+    with trace_span(f"discord {route}", "client") as span:
+        response = await discord_rate_limiter.request(method, path, **kwargs)
+        if span is not None:
+            span.attributes["http.status_code"] = response.status_code
+        return response
+
+def to_timestamp(value: datetime) -> int:
+    """Convert a naive UTC datetime to a Unix timestamp"""
+    return int((value - datetime(1970, 1, 1)).total_seconds())
+
+@dataclass
+class RenderedPayload:
+    """Serialized JSON body with the validators used for conditional GETs"""
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """Get the strong ETag of one encoding of the body"""
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+def render_payload(content: Any, last_modified: datetime) -> RenderedPayload:
+    """Serialize a response body once and derive its strong ETag"""
+    body = orjson.dumps(content, default=orjson_default)
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    return RenderedPayload(body, etag, last_modified.replace(microsecond=0))
+
+def is_not_modified(request: Request, payload: RenderedPayload) -> bool:
+    """Check If-None-Match, or If-Modified-Since when no ETag was sent"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison, as RFC 9110 requires for If-None-Match
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        prefix = payload.etag[:-1] + "-"
+        return "*" in tags or any(tag == payload.etag or tag.startswith(prefix) for tag in tags)
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        return payload.last_modified <= since
+    return False
+
+def conditional_response(request: Request, payload: RenderedPayload, cache_control: str, vary: Optional[str] = None) -> Response:
+    """Send a rendered payload, or an empty 304 if the client already has it"""
+    # Compressed here rather than by the middleware so each encoding keeps its own strong ETag
+    compressible = COMPRESSION_ENABLED and len(payload.body) >= COMPRESSION_MINIMUM_SIZE
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", "")) if compressible else None
+    if compressible:
+        vary = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+    
+    headers = {
+        "ETag": payload.etag_for(encoding),
+        "Last-Modified": format_datetime(payload.last_modified.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": cache_control,
+    }
+    if vary:
+        headers["Vary"] = vary
+    if is_not_modified(request, payload):
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return Response(payload.body, media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(compress_body(payload.body, encoding), media_type="application/json", headers=headers)
+
+def create_access_token(user_id: str, user: Optional[User] = None, token_version: int = 0) -> str:
     """Create JWT access token"""
     payload = {
         "sub": user_id,
         "exp": datetime.utcnow() + timedelta(hours=24)
     }
+    if JWT_CLAIMS_MODE and user is not None:
+        # Self-contained token, get_current_user can rebuild the User without a lookup
+        payload.update({
+            "ver": token_version,
+            "username": user.username,
+            "discriminator": user.discriminator,
+            "avatar": user.avatar,
+            "email": user.email,
+            "is_admin": user.is_admin,
+            "joined_at": to_timestamp(user.joined_at),
+            "last_login": to_timestamp(user.last_login),
+        })
     return jwt.encode(payload, SESSION_SECRET, algorithm="HS256")
 
-def verify_token(token: str) -> Optional[str]:
-    """Verify JWT token and return user ID"""
+def decode_token(token: str) -> Optional[Dict[str, Any]]:
+    """Verify JWT token and return its claims"""
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(digest)
+    if claims is not None:
+        return claims
+    
     try:
-        payload = jwt.decode(token, SESSION_SECRET, algorithms=["HS256"])
-        return payload.get("sub")
+        claims = jwt.decode(token, SESSION_SECRET, algorithms=["HS256"])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    
+    # Never keep a token in the cache past its own expiry
+    ttl = token_cache.ttl
+    if "exp" in claims:
+        ttl = min(ttl, claims["exp"] - time.time())
+    token_cache.set(digest, claims, ttl=ttl)
+    return claims
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+def verify_token(token: str) -> Optional[str]:
+    """Verify JWT token and return user ID"""
+    payload = decode_token(token)
+    return payload.get("sub") if payload else None
+
+async def get_token_version(user_id: str) -> int:
+    """Get the user's current token version, -1 if the user no longer exists"""
+    version = token_versions.get(user_id)
+    if version is None:
+        user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "token_version": 1})
+        # An existing document projects to {} when it predates token_version
+        version = user_doc.get("token_version", 0) if user_doc is not None else -1
+        token_versions.set(user_id, version)
+    return version
+
+async def user_from_claims(claims: Dict[str, Any]) -> Optional[UserRecord]:
+    """Build the User carried by a self-contained token, None if the token was revoked"""
+    user_id = claims["sub"]
+    if claims["is_admin"] and user_id not in ADMIN_USER_IDS:
+        # Demoted through the admin list since the token was issued
+        return None
+    if claims["ver"] != await get_token_version(user_id):
+        return None
+    return UserRecord(
+        id=user_id,
+        username=claims["username"],
+        discriminator=claims["discriminator"],
+        avatar=claims.get("avatar"),
+        email=claims.get("email"),
+        is_admin=claims["is_admin"],
+        joined_at=datetime.utcfromtimestamp(claims["joined_at"]),
+        last_login=datetime.utcfromtimestamp(claims["last_login"]),
+    )
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> UserRecord:
     """Get current user from token"""
     token = credentials.credentials
-    user_id = verify_token(token)
+    claims = decode_token(token)
+    user_id = claims.get("sub") if claims else None
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user_doc = await db.users.find_one({"id": user_id})
+    if "ver" in claims:
+        user = await user_from_claims(claims)
+        if user is None:
+            raise HTTPException(status_code=401, detail="Token revoked")
+        return user
+    
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    
+    user_doc = await db.users.find_one({"id": user_id}, USER_PROJECTION)
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return User(**user_doc)
+    user = user_from_doc(user_doc)
+    user_cache.set(user_id, user)
+    return user
+
+def encode_users_cursor(user: UserRecord) -> str:
+    """Encode the (joined_at, id) position after a user as an opaque cursor"""
+    position = {"joined_at": user.joined_at.isoformat(), "id": user.id}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+def decode_users_cursor(cursor: str) -> Dict[str, Any]:
+    """Turn a users cursor back into a query for the rows that follow it"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        joined_at = datetime.fromisoformat(position["joined_at"])
+        last_id = str(position["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"joined_at": {"$lt": joined_at}},
+        {"joined_at": joined_at, "id": {"$lt": last_id}}
+    ]}
+
+def json_default(value: Any) -> Any:
+    """Serialize values the json module does not handle natively"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def csv_value(value: Any) -> str:
+    """Format a field for the CSV export, spelling booleans and nulls as the NDJSON export does"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return json_default(value)
+
+async def iter_users_export(fields: List[str], export_format: str):
+    """Stream every user as NDJSON or CSV, one Mongo batch per chunk"""
+    cursor = db.users.find(
+        {},
+        projection={"_id": 0, **{field: 1 for field in fields}},
+        batch_size=USERS_EXPORT_BATCH_SIZE
+    ).sort(USERS_SORT)
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(fields)
+    
+    rows = 0
+    async for user_doc in cursor:
+        if export_format == "csv":
+            writer.writerow([csv_value(user_doc.get(f)) for f in fields])
+        else:
+            buffer.write(json.dumps({f: user_doc.get(f) for f in fields}, default=json_default))
+            buffer.write("\n")
+        rows += 1
+        if rows % USERS_EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+async def aggregate_users_summary() -> Dict[str, Any]:
+    """Count users and admins and fetch the most recent users concurrently"""
+    # Separate queries rather than one $facet, which cannot use indexes: the admin
+    # count scans the is_admin index and the recent users walk joined_at_id_desc
+    total_users, admin_users, recent_users = await asyncio.gather(
+        db.users.estimated_document_count(),
+        db.users.count_documents({"is_admin": True}),
+        db.users.find({}, USER_PROJECTION).sort(USERS_SORT).limit(ADMIN_RECENT_USERS).to_list(ADMIN_RECENT_USERS)
+    )
+    return {
+        "total_users": total_users,
+        "admin_users": admin_users,
+        "recent_users": recent_users
+    }
+
+async def refresh_users_summary():
+    """Recompute the users summary and store it for cached dashboard reads"""
+    summary = await aggregate_users_summary()
+    await db.summaries.replace_one(
+        {"_id": "users"},
+        {**summary, "updated_at": datetime.utcnow()},
+        upsert=True
+    )
+
+async def run_users_summary_refresher():
+    """Refresh the users summary document every USERS_SUMMARY_INTERVAL seconds"""
+    while True:
+        try:
+            await refresh_users_summary()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error refreshing users summary: {e}")
+        await asyncio.sleep(USERS_SUMMARY_INTERVAL)
+
+async def ensure_user_indexes() -> List[str]:
+    """Create missing users indexes and return the names of those created"""
+    existing = await db.users.index_information()
+    existing_keys = {tuple(tuple(key) for key in info["key"]) for info in existing.values()}
+    
+    created = []
+    for keys, options in USER_INDEXES:
+        if options["name"] in existing or tuple(keys) in existing_keys:
+            continue
+        try:
+            await db.users.create_index(keys, **options)
+        except DuplicateKeyError as e:
+            duplicates = await db.users.aggregate([
+                {"$group": {"_id": "$id", "count": {"$sum": 1}}},
+                {"$match": {"count": {"$gt": 1}}},
+                {"$limit": 20}
+            ]).to_list(20)
+            ids = ", ".join(f"{d['_id']} (x{d['count']})" for d in duplicates)
+            raise RuntimeError(f"Cannot create unique index on users.id, duplicate ids: {ids}") from e
+        created.append(options["name"])
+    
+    if created:
+        logger.info(f"Created users indexes: {', '.join(created)}")
+    else:
+        logger.info("Users indexes already up to date")
+    return created
 
 async def get_discord_user_info(access_token: str) -> Dict[str, Any]:
     """Get user info from Discord API"""
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            "https://discord.com/api/v10/users/@me",
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to fetch user info")
-        return response.json()
+    response = await discord_request(
+        "GET",
+        "/users/@me",
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    if response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to fetch user info")
+    return response.json()
 
 async def get_discord_guilds(access_token: str) -> List[Dict[str, Any]]:
     """Get user's Discord guilds"""
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            "https://discord.com/api/v10/users/@me/guilds",
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
-        if response.status_code != 200:
-            return []
-        return response.json()
+    response = await discord_request(
+        "GET",
+        "/users/@me/guilds",
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    if response.status_code != 200:
+        return []
+    return response.json()
 
-async def get_discord_server_stats() -> ServerStats:
-    """Get Discord server statistics"""
+async def check_guild_membership(user_id: str, access_token: str) -> bool:
+    """Check FDM server membership with a bot member lookup"""
+    if membership_cache.get(user_id):
+        return True
+    
+    response = await discord_request(
+        "GET",
+        f"/guilds/{DISCORD_GUILD_ID}/members/{user_id}",
+        headers={"Authorization": f"Bot {DISCORD_BOT_TOKEN}"}
+    )
+    if response.status_code == 200:
+        membership_cache.set(user_id, True)
+        return True
+    if response.status_code == 404 and discord_error_code(response) == DISCORD_UNKNOWN_MEMBER:
+        return False
+    
+    # Bot lookup unavailable (or the guild itself unknown to the bot), fall back to the user's guild list
+    logger.warning(f"Bot member lookup failed: {response.status_code}, using guilds scope")
+    guilds = await get_discord_guilds(access_token)
+    return any(guild["id"] == DISCORD_GUILD_ID for guild in guilds)
+
+async def fetch_discord_server_stats(previous: Optional[ServerStats] = None) -> ServerStats:
+    """Fetch Discord server statistics, raising only if every call fails"""
     if not DISCORD_BOT_TOKEN or not DISCORD_GUILD_ID:
         return ServerStats(
             member_count=0,
@@ -157,47 +1506,655 @@ async def get_discord_server_stats() -> ServerStats:
             role_count=0
         )
     
-    async with httpx.AsyncClient() as client:
+    headers = {"Authorization": f"Bot {DISCORD_BOT_TOKEN}"}
+    
+    async def fetch(path: str) -> Any:
+        response = await discord_request("GET", path, headers=headers, timeout=DISCORD_STATS_CALL_TIMEOUT)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+        return response.json()
+    
+    # Get guild info, channels and roles concurrently
+    results = await asyncio.gather(
+        fetch(f"/guilds/{DISCORD_GUILD_ID}"),
+        fetch(f"/guilds/{DISCORD_GUILD_ID}/channels"),
+        fetch(f"/guilds/{DISCORD_GUILD_ID}/roles"),
+        return_exceptions=True
+    )
+    
+    failures = [result for result in results if isinstance(result, Exception)]
+    if len(failures) == len(results):
+        raise RuntimeError(f"Failed to fetch guild stats: {failures[0]!r}")
+    for failure in failures:
+        logger.warning(f"Partial Discord stats, call failed: {failure!r}")
+    
+    # Take the counts of failed calls from the previous snapshot, or 0 on a cold fetch,
+    # and flag the result as degraded
+    counts = stats_counts(previous) if previous is not None else {
+        "member_count": 0, "online_count": 0, "boost_count": 0, "channel_count": 0, "role_count": 0
+    }
+    guild_data, channels_data, roles_data = results
+    if not isinstance(guild_data, Exception):
+        counts.update(
+            member_count=guild_data.get("member_count", 0),
+            online_count=guild_data.get("approximate_presence_count", 0),
+            boost_count=guild_data.get("premium_subscription_count", 0),
+        )
+    if not isinstance(channels_data, Exception):
+        counts["channel_count"] = len(channels_data)
+    if not isinstance(roles_data, Exception):
+        counts["role_count"] = len(roles_data)
+    counts["degraded"] = bool(failures)
+    
+    return ServerStats(**counts)
+
+def stats_counts(stats: ServerStats) -> Dict[str, Any]:
+    """Get the fields of a ServerStats snapshot that matter to clients, ignoring updated_at"""
+    return stats.model_dump(exclude={"updated_at"})
+
+class StatsCache:
+    """TTL cache for ServerStats with single-flight refresh and stale-while-revalidate"""
+
+    def __init__(self, ttl: float, stale_ttl: float):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._value: Optional[ServerStats] = None
+        self._fetched_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    async def get(self) -> ServerStats:
+        """Get cached stats, fetching from Discord on a miss"""
+        age = time.monotonic() - self._fetched_at
+        if self._value is not None and age < self.ttl:
+            self.hits += 1
+            return self._value
+        
+        if self._value is not None and age < self.ttl + self.stale_ttl:
+            # Serve the last good value while a single refresh runs in the background
+            self.stale_hits += 1
+            if self._inflight is None:
+                self._start_refresh().add_done_callback(self._discard_result)
+            return self._value
+        
+        if self._inflight is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+        
         try:
-            # Get guild info
-            guild_response = await client.get(
-                f"https://discord.com/api/v10/guilds/{DISCORD_GUILD_ID}",
-                headers={"Authorization": f"Bot {DISCORD_BOT_TOKEN}"}
-            )
-            
-            if guild_response.status_code != 200:
-                logger.error(f"Failed to fetch guild info: {guild_response.status_code}")
-                return ServerStats(member_count=0, online_count=0, boost_count=0, channel_count=0, role_count=0)
-            
-            guild_data = guild_response.json()
-            
-            # Get channels
-            channels_response = await client.get(
-                f"https://discord.com/api/v10/guilds/{DISCORD_GUILD_ID}/channels",
-                headers={"Authorization": f"Bot {DISCORD_BOT_TOKEN}"}
-            )
-            
-            channels_data = channels_response.json() if channels_response.status_code == 200 else []
-            
-            # Get roles
-            roles_response = await client.get(
-                f"https://discord.com/api/v10/guilds/{DISCORD_GUILD_ID}/roles",
-                headers={"Authorization": f"Bot {DISCORD_BOT_TOKEN}"}
-            )
+            return await self.refresh()
+        except Exception as e:
+            logger.error(f"Error fetching Discord stats: {e}")
+            if self._value is not None:
+                return self._value
+            return ServerStats(member_count=0, online_count=0, boost_count=0, channel_count=0, role_count=0, degraded=True)
+
+    async def refresh(self) -> ServerStats:
+        """Fetch fresh stats, joining the in-flight fetch if there is one"""
+        task = self._inflight or self._start_refresh()
+        return await asyncio.shield(task)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "in_flight": self._inflight is not None,
+            "age_seconds": round(time.monotonic() - self._fetched_at, 3) if self._value is not None else None,
+        }
+
+    def _start_refresh(self) -> asyncio.Task:
+        self._inflight = asyncio.ensure_future(self._fetch())
+        return self._inflight
+
+    async def _fetch(self) -> ServerStats:
+        try:
+            stats = await fetch_discord_server_stats(self._value)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self._inflight = None
+        self._value = stats
+        self._fetched_at = time.monotonic()
+        return stats
+
+    @staticmethod
+    def _discard_result(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error refreshing Discord stats: {task.exception()}")
+
+stats_cache = StatsCache(ttl=STATS_CACHE_TTL, stale_ttl=STATS_CACHE_STALE_TTL)
+
+class StatsSubscriber:
+    """One SSE client: a bounded queue of encoded snapshots"""
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+class StatsBroadcaster:
+    """Fans ServerStats changes out to every SSE subscriber"""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._last_counts: Optional[Dict[str, Any]] = None
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self) -> StatsSubscriber:
+        """Register a new subscriber"""
+        subscriber = StatsSubscriber(self.queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: StatsSubscriber):
+        """Forget a subscriber"""
+        self._subscribers.discard(subscriber)
+
+    def publish(self, stats: ServerStats):
+        """Push a snapshot to all subscribers if its counts changed"""
+        counts = stats_counts(stats)
+        if counts == self._last_counts:
+            return
+        self._last_counts = counts
+        self.published += 1
+        
+        payload = orjson.dumps(stats, default=orjson_default).decode()
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # Slow client, drop it rather than buffer without bound
+                subscriber.dropped = True
+                self._subscribers.discard(subscriber)
+                self.dropped += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get subscriber counters"""
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+stats_broadcaster = StatsBroadcaster(queue_size=STATS_STREAM_QUEUE_SIZE)
+
+class StatsRefresher:
+    """Background task that refreshes ServerStats and publishes the latest snapshot"""
+
+    def __init__(self, cache: StatsCache, interval: float, max_backoff: float):
+        self.cache = cache
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.snapshot: Optional[ServerStats] = None
+        self.published_at: Optional[datetime] = None
+        self.refreshes = 0
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Launch the refresh loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the refresh loop and wait for it to exit"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def publish(self, stats: ServerStats):
+        """Publish a new snapshot for request handlers and stream subscribers"""
+        self.published_at = datetime.utcnow()
+        if self.snapshot is not None and stats_counts(self.snapshot) == stats_counts(stats):
+            # Keep the current snapshot so updated_at, the body and its ETag only change with the counts
+            return
+        self.snapshot = stats
+        stats_broadcaster.publish(stats)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get refresher counters"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "refreshes": self.refreshes,
+            "consecutive_failures": self.failures,
+            "published_at": self.published_at,
+        }
+
+    def _next_delay(self) -> float:
+        if self.failures == 0:
+            return self.interval
+        # Exponential backoff with jitter so restarts don't retry Discord in lockstep
+        backoff = min(self.max_backoff, 2 ** self.failures)
+        return random.uniform(backoff / 2, backoff)
+
+    async def _run(self):
+        while True:
+            if discord_gateway.is_ready:
+                # Gateway events keep the snapshot current, no REST polling needed
+                await asyncio.sleep(self.interval)
+                continue
+            try:
+                self.publish(await self.cache.refresh())
+                self.refreshes += 1
+                self.failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Error refreshing Discord stats (attempt {self.failures}): {e}")
+            await asyncio.sleep(self._next_delay())
+
+stats_refresher = StatsRefresher(stats_cache, interval=STATS_REFRESH_INTERVAL, max_backoff=STATS_REFRESH_MAX_BACKOFF)
+
+async def get_server_stats() -> ServerStats:
+    """Get the latest published ServerStats, falling back to the cache until the first refresh"""
+    if stats_refresher.snapshot is not None:
+        return stats_refresher.snapshot
+    return await stats_cache.get()
+
+# Rendered body of the last ServerStats served, reused until the snapshot changes
+stats_payload: Optional[Tuple[ServerStats, RenderedPayload]] = None
+
+def get_stats_payload(stats: ServerStats) -> RenderedPayload:
+    """Get the rendered body and validators of a ServerStats snapshot"""
+    global stats_payload
+    if stats_payload is None or stats_payload[0] is not stats:
+        stats_payload = (stats, render_payload(stats, stats.updated_at))
+    return stats_payload[1]
+
+# Gateway opcodes
+GATEWAY_DISPATCH = 0
+GATEWAY_HEARTBEAT = 1
+GATEWAY_IDENTIFY = 2
+GATEWAY_RESUME = 6
+GATEWAY_RECONNECT = 7
+GATEWAY_INVALID_SESSION = 9
+GATEWAY_HELLO = 10
+GATEWAY_HEARTBEAT_ACK = 11
+
+# GUILDS, GUILD_MEMBERS and GUILD_PRESENCES; the last two are privileged intents
+GATEWAY_INTENTS = (1 << 0) | (1 << 1) | (1 << 8)
+
+# Close codes after which reconnecting cannot succeed
+GATEWAY_FATAL_CLOSE_CODES = {4004, 4010, 4011, 4012, 4013, 4014}
+
+# Close codes after which the session cannot be resumed
+GATEWAY_RESET_CLOSE_CODES = {4007, 4009}
+
+class DiscordGateway:
+    """Bot Gateway connection that maintains guild counts from dispatch events"""
+
+    def __init__(self, url: str, intents: int, publish_interval: float):
+        self.url = url
+        self.intents = intents
+        self.publish_interval = publish_interval
+        self.member_count = 0
+        self.boost_count = 0
+        self.channels = set()
+        self.roles = set()
+        self.online = set()
+        self.connected = False
+        self.loaded = False
+        self.session_id: Optional[str] = None
+        self.resume_url: Optional[str] = None
+        self.sequence: Optional[int] = None
+        self.events = 0
+        self.reconnects = 0
+        self._acked = True
+        self._dirty = False
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def is_ready(self) -> bool:
+        return self.connected and self.loaded
+
+    def start(self):
+        """Connect and keep the connection alive in the background"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()), asyncio.create_task(self._publish_loop())]
+
+    async def stop(self):
+        """Close the connection and stop the background tasks"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self.connected = False
+
+    def to_stats(self) -> ServerStats:
+        """Current counts as a ServerStats snapshot"""
+        return ServerStats(
+            member_count=self.member_count,
+            online_count=len(self.online),
+            boost_count=self.boost_count,
+            channel_count=len(self.channels),
+            role_count=len(self.roles)
+        )
+
+    def handle_dispatch(self, event: str, data: Dict[str, Any]):
+        """Apply one dispatch event to the guild counts"""
+        if event == "READY":
+            self.session_id = data["session_id"]
+            self.resume_url = data.get("resume_gateway_url")
+            self.connected = True
+            return
+        if event == "RESUMED":
+            self.connected = True
+            return
+        
+        guild_id = data.get("id") if event in ("GUILD_CREATE", "GUILD_UPDATE") else data.get("guild_id")
+        if guild_id != DISCORD_GUILD_ID:
+            return
+        
+        if event == "GUILD_CREATE":
+            if data.get("unavailable"):
+                return
+            self.member_count = data.get("member_count", 0)
+            self.boost_count = data.get("premium_subscription_count") or 0
+            self.channels = {channel["id"] for channel in data.get("channels", [])}
+            self.roles = {role["id"] for role in data.get("roles", [])}
+            self.online = {
+                presence["user"]["id"] for presence in data.get("presences", [])
+                if presence.get("status", "offline") != "offline"
+            }
+            self.loaded = True
+        elif event == "GUILD_UPDATE":
+            self.boost_count = data.get("premium_subscription_count") or 0
+            if "roles" in data:
+                self.roles = {role["id"] for role in data["roles"]}
+        elif event == "GUILD_MEMBER_ADD":
+            self.member_count += 1
+        elif event == "GUILD_MEMBER_REMOVE":
+            self.member_count = max(0, self.member_count - 1)
+            self.online.discard(data["user"]["id"])
+        elif event == "CHANNEL_CREATE":
+            self.channels.add(data["id"])
+        elif event == "CHANNEL_DELETE":
+            self.channels.discard(data["id"])
+        elif event == "GUILD_ROLE_CREATE":
+            self.roles.add(data["role"]["id"])
+        elif event == "GUILD_ROLE_DELETE":
+            self.roles.discard(data["role_id"])
+        elif event == "PRESENCE_UPDATE":
+            if data.get("status", "offline") == "offline":
+                self.online.discard(data["user"]["id"])
+            else:
+                self.online.add(data["user"]["id"])
+        else:
+            return
+        self._dirty = True
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get connection state and event counters"""
+        return {
+            "connected": self.connected,
+            "ready": self.is_ready,
+            "events": self.events,
+            "reconnects": self.reconnects,
+            "sequence": self.sequence,
+        }
+
+    async def _run(self):
+        failures = 0
+        while True:
+            try:
+                close_code = await self._session()
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                close_code = None
+                failures += 1
+                logger.error(f"Discord gateway connection failed (attempt {failures}): {e!r}")
             
-            roles_data = roles_response.json() if roles_response.status_code == 200 else []
+            if close_code in GATEWAY_FATAL_CLOSE_CODES:
+                logger.error(f"Discord gateway closed with fatal code {close_code}, falling back to REST polling")
+                return
+            if close_code in GATEWAY_RESET_CLOSE_CODES:
+                self.session_id = None
+                self.sequence = None
             
-            return ServerStats(
-                member_count=guild_data.get("member_count", 0),
-                online_count=guild_data.get("approximate_presence_count", 0),
-                boost_count=guild_data.get("premium_subscription_count", 0),
-                channel_count=len(channels_data),
-                role_count=len(roles_data)
+            self.reconnects += 1
+            await asyncio.sleep(random.uniform(1, min(60, 2 ** (failures + 1))))
+
+    async def _session(self) -> Optional[int]:
+        """Run one websocket connection and return its close code"""
+        resuming = self.session_id is not None and self.sequence is not None
+        url = f"{self.resume_url}/?{urlsplit(self.url).query}" if resuming and self.resume_url else self.url
+        
+        async with websockets.connect(url, max_size=None) as ws:
+            hello = json.loads(await ws.recv())
+            if hello["op"] != GATEWAY_HELLO:
+                raise RuntimeError(f"Expected HELLO from gateway, got op {hello['op']}")
+            self._acked = True
+            heartbeat = asyncio.create_task(self._heartbeat(ws, hello["d"]["heartbeat_interval"] / 1000))
+            try:
+                if resuming:
+                    await ws.send(json.dumps({"op": GATEWAY_RESUME, "d": {
+                        "token": DISCORD_BOT_TOKEN,
+                        "session_id": self.session_id,
+                        "seq": self.sequence
+                    }}))
+                else:
+                    self.loaded = False
+                    await ws.send(json.dumps({"op": GATEWAY_IDENTIFY, "d": {
+                        "token": DISCORD_BOT_TOKEN,
+                        "intents": self.intents,
+                        "properties": {"os": "linux", "browser": "fdm-community", "device": "fdm-community"}
+                    }}))
+                
+                async for message in ws:
+                    payload = json.loads(message)
+                    op = payload["op"]
+                    if op == GATEWAY_DISPATCH:
+                        self.sequence = payload["s"]
+                        self.events += 1
+                        self.handle_dispatch(payload["t"], payload["d"])
+                    elif op == GATEWAY_HEARTBEAT:
+                        await ws.send(json.dumps({"op": GATEWAY_HEARTBEAT, "d": self.sequence}))
+                    elif op == GATEWAY_HEARTBEAT_ACK:
+                        self._acked = True
+                    elif op == GATEWAY_RECONNECT:
+                        break
+                    elif op == GATEWAY_INVALID_SESSION:
+                        if not payload.get("d"):
+                            self.session_id = None
+                            self.sequence = None
+                        await asyncio.sleep(random.uniform(1, 5))
+                        break
+            except websockets.ConnectionClosed:
+                # Abnormal closes still carry the code that decides between resume, re-identify and giving up
+                pass
+            finally:
+                heartbeat.cancel()
+                self.connected = False
+        return ws.close_code
+
+    async def _heartbeat(self, ws, interval: float):
+        await asyncio.sleep(interval * random.random())
+        while True:
+            if not self._acked:
+                # No ACK since the last heartbeat, drop the zombie connection and resume
+                await ws.close(code=4000)
+                return
+            self._acked = False
+            await ws.send(json.dumps({"op": GATEWAY_HEARTBEAT, "d": self.sequence}))
+            await asyncio.sleep(interval)
+
+    async def _publish_loop(self):
+        # Coalesce bursts of events (e.g. presence storms) into one snapshot per interval
+        while True:
+            await asyncio.sleep(self.publish_interval)
+            if self._dirty and self.is_ready:
+                self._dirty = False
+                stats_refresher.publish(self.to_stats())
+
+discord_gateway = DiscordGateway(
+    url=DISCORD_GATEWAY_URL,
+    intents=GATEWAY_INTENTS,
+    publish_interval=DISCORD_GATEWAY_PUBLISH_INTERVAL
+)
+
+class LoginWriteBehind:
+    """Coalesces login updates per user and flushes them to Mongo with bulk_write"""
+
+    def __init__(self, interval: float, max_pending: int):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.written = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Launch the flush loop"""
+        if self._task is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop once its current flush is done and write out everything still pending"""
+        if self._task is not None:
+            # Wake the loop rather than cancel it, a cancelled flush would lose the batch it took
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def enqueue(self, user_id: str, fields: Dict[str, Any]):
+        """Queue a $set for a user, merging with any update not yet flushed"""
+        self.enqueued += 1
+        if user_id in self._pending:
+            self.coalesced += 1
+            self._pending[user_id].update(fields)
+        else:
+            self._pending[user_id] = dict(fields)
+        if len(self._pending) >= self.max_pending and self._wake is not None:
+            self._wake.set()
+
+    async def flush(self):
+        """Write all pending updates in one unordered bulk_write"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            await db.users.bulk_write(
+                [UpdateOne({"id": user_id}, {"$set": fields}) for user_id, fields in batch.items()],
+                ordered=False
             )
-            
         except Exception as e:
-            logger.error(f"Error fetching Discord stats: {e}")
-            return ServerStats(member_count=0, online_count=0, boost_count=0, channel_count=0, role_count=0)
+            self.errors += 1
+            logger.error(f"Error flushing {len(batch)} login updates: {e}")
+            # Put the batch back underneath anything queued since
+            for user_id, fields in batch.items():
+                self._pending[user_id] = {**fields, **self._pending.get(user_id, {})}
+            return
+        self.flushes += 1
+        self.written += len(batch)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get queue counters"""
+        return {
+            "running": self.running,
+            "pending": len(self._pending),
+            "enqueued": self.enqueued,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "written": self.written,
+            "errors": self.errors,
+        }
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+login_writer = LoginWriteBehind(interval=LOGIN_FLUSH_INTERVAL, max_pending=LOGIN_FLUSH_MAX_PENDING)
+
+async def get_login_state(user_id: str) -> Optional[Dict[str, Any]]:
+    """Get joined_at, is_admin and token_version of a returning user, None on first login"""
+    cached = user_cache.get(user_id)
+    version = token_versions.get(user_id)
+    if cached is not None and version is not None and version >= 0:
+        return {"joined_at": cached.joined_at, "is_admin": cached.is_admin, "token_version": version}
+    return await db.users.find_one({"id": user_id}, {"_id": 0, "joined_at": 1, "is_admin": 1, "token_version": 1})
+
+class StageTimings:
+    """Aggregated durations of named pipeline stages"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._stages: Dict[str, Dict[str, float]] = {}
+
+    def record(self, timings: Dict[str, float]):
+        """Add one run's stage durations (seconds) and log them"""
+        for stage, seconds in timings.items():
+            entry = self._stages.setdefault(stage, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            entry["last"] = seconds
+        logger.info(f"{self.name} timings: " + ", ".join(
+            f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in timings.items()
+        ))
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get per-stage count, average, max and last duration in milliseconds"""
+        return {
+            stage: {
+                "count": int(entry["count"]),
+                "avg_ms": round(entry["total"] / entry["count"] * 1000, 2),
+                "max_ms": round(entry["max"] * 1000, 2),
+                "last_ms": round(entry["last"] * 1000, 2),
+            }
+            for stage, entry in self._stages.items()
+        }
+
+callback_timings = StageTimings("OAuth callback")
+
+async def timed(stage: str, timings: Dict[str, float], awaitable):
+    """Await and record how long it took under the given stage name"""
+    started = time.perf_counter()
+    try:
+        with trace_span(stage):
+            return await awaitable
+    finally:
+        timings[stage] = time.perf_counter() - started
 
 # Routes
 @api_router.get("/")
@@ -217,73 +2174,110 @@ async def discord_auth():
     )
     return {"url": discord_oauth_url}
 
-@api_router.get("/auth/callback")
-async def discord_callback(code: str, request: Request):
-    """Handle Discord OAuth callback"""
-    async with httpx.AsyncClient() as client:
-        # Exchange code for access token
-        token_response = await client.post(
-            "https://discord.com/api/oauth2/token",
-            data={
-                "client_id": CLIENT_ID,
-                "client_secret": CLIENT_SECRET,
-                "grant_type": "authorization_code",
-                "code": code,
-                "redirect_uri": REDIRECT_URI,
-            },
-            headers={"Content-Type": "application/x-www-form-urlencoded"}
+async def run_callback_pipeline(code: str, request: Request, timings: Dict[str, float]) -> Dict[str, Any]:
+    """Exchange an OAuth code, verify membership and log the user in, recording stage timings"""
+    # Exchange code for access token
+    token_response = await timed("token_exchange", timings, discord_request(
+        "POST",
+        "/oauth2/token",
+        data={
+            "client_id": CLIENT_ID,
+            "client_secret": CLIENT_SECRET,
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": REDIRECT_URI,
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    ))
+    
+    if token_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to exchange code for token")
+    
+    token_data = token_response.json()
+    access_token = token_data["access_token"]
+    
+    # Get user info and check if user is in the Discord server
+    if DISCORD_BOT_TOKEN:
+        # The bot member lookup needs the user id but returns a single small object
+        user_info = await timed("user_info", timings, get_discord_user_info(access_token))
+        is_in_server = await timed("membership", timings, check_guild_membership(user_info["id"], access_token))
+    else:
+        # Without a bot token scan the user's guild list, fetched alongside user info
+        user_info, guilds = await asyncio.gather(
+            timed("user_info", timings, get_discord_user_info(access_token)),
+            timed("guilds", timings, get_discord_guilds(access_token))
         )
-        
-        if token_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to exchange code for token")
-        
-        token_data = token_response.json()
-        access_token = token_data["access_token"]
-        
-        # Get user info
-        user_info = await get_discord_user_info(access_token)
-        
-        # Check if user is in the Discord server
-        guilds = await get_discord_guilds(access_token)
         is_in_server = any(guild["id"] == DISCORD_GUILD_ID for guild in guilds)
-        
-        if not is_in_server:
-            raise HTTPException(status_code=403, detail="You must be a member of the FDM Discord server")
-        
-        # Create or update user
-        user_id = user_info["id"]
-        is_admin = user_id in ADMIN_USER_IDS
-        
-        user_doc = {
-            "id": user_id,
-            "username": user_info["username"],
-            "discriminator": user_info.get("discriminator", "0000"),
-            "avatar": user_info.get("avatar"),
-            "email": user_info.get("email"),
-            "is_admin": is_admin,
-            "last_login": datetime.utcnow()
-        }
-        
-        # Update or insert user
-        await db.users.update_one(
+    
+    if not is_in_server:
+        raise HTTPException(status_code=403, detail="You must be a member of the FDM Discord server")
+    
+    # Create or update user
+    user_id = user_info["id"]
+    is_admin = user_id in ADMIN_USER_IDS
+    
+    user_doc = {
+        "id": user_id,
+        "username": user_info["username"],
+        "discriminator": user_info.get("discriminator", "0000"),
+        "avatar": user_info.get("avatar"),
+        "email": user_info.get("email"),
+        "is_admin": is_admin,
+        "last_login": datetime.utcnow()
+    }
+    
+    # Look up the existing user, usually answered by the caches
+    previous = await timed("db_lookup", timings, get_login_state(user_id))
+    
+    # New users start at their creation time in microseconds, so a user deleted and created again
+    # never reuses a version carried by tokens issued before the deletion
+    token_version = previous.get("token_version", 0) if previous else time.time_ns() // 1000
+    demoted = bool(previous and previous.get("is_admin") and not is_admin)
+    if demoted:
+        # Revoke tokens still carrying admin claims
+        token_version += 1
+    
+    if previous is None or demoted or not login_writer.running:
+        # First logins must exist before the JWT is issued, demotions must apply now
+        await timed("db_upsert", timings, db.users.update_one(
             {"id": user_id},
-            {"$set": user_doc, "$setOnInsert": {"joined_at": datetime.utcnow()}},
+            {"$set": {**user_doc, "token_version": token_version}, "$setOnInsert": {"joined_at": user_doc["last_login"]}},
             upsert=True
-        )
-        
-        # Create access token
-        jwt_token = create_access_token(user_id)
-        
-        # Set session
-        request.session["user_id"] = user_id
-        request.session["access_token"] = jwt_token
-        
-        return {"access_token": jwt_token, "user": user_doc}
+        ))
+    else:
+        login_writer.enqueue(user_id, user_doc)
+    
+    # Serve the fresh profile from the caches until the queued update is flushed
+    joined_at = previous.get("joined_at") if previous else None
+    user = User(**user_doc, joined_at=joined_at or user_doc["last_login"])
+    user_cache.set(user_id, user_from_doc(user.model_dump()))
+    token_versions.set(user_id, token_version)
+    
+    # Create access token
+    jwt_token = create_access_token(user_id, user, token_version)
+    
+    # Set session
+    request.session["user_id"] = user_id
+    request.session["access_token"] = jwt_token
+    
+    return {"access_token": jwt_token, "user": user_doc}
+
+@api_router.get("/auth/callback")
+async def discord_callback(code: str, request: Request):
+    """Handle Discord OAuth callback"""
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    try:
+        return await run_callback_pipeline(code, request, timings)
+    finally:
+        timings["total"] = time.perf_counter() - started
+        callback_timings.record(timings)
 
 @api_router.get("/auth/me")
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(request: Request, current_user: UserRecord = Depends(get_current_user)):
     """Get current user info"""
-    return current_user
+    payload = render_payload(current_user, current_user.last_login)
+    return conditional_response(request, payload, "private, no-cache", vary="Authorization")
 
 @api_router.post("/auth/logout")
 async def logout(request: Request):
@@ -292,74 +2286,241 @@ async def logout(request: Request):
     return {"message": "Logged out successfully"}
 
 @api_router.get("/stats")
-async def get_stats():
+async def get_stats(request: Request):
     """Get Discord server statistics"""
-    stats = await get_discord_server_stats()
-    return stats
+    stats = await get_server_stats()
+    return conditional_response(
+        request, get_stats_payload(stats), f"public, max-age={STATS_HTTP_MAX_AGE}, must-revalidate"
+    )
+
+@api_router.get("/stats/stream")
+async def stream_stats():
+    """Stream Discord server statistics as Server-Sent Events"""
+    subscriber = stats_broadcaster.subscribe()
+    initial = await get_server_stats()
+    
+    async def events():
+        try:
+            yield f"event: stats\ndata: {orjson.dumps(initial, default=orjson_default).decode()}\n\n"
+            while not subscriber.dropped:
+                try:
+                    payload = await asyncio.wait_for(subscriber.queue.get(), timeout=STATS_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Comment frame keeps proxies and the browser connection alive
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"event: stats\ndata: {payload}\n\n"
+        finally:
+            stats_broadcaster.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/metrics")
+async def get_metrics(current_user: UserRecord = Depends(get_current_user)):
+    """Get in-process cache counters (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {
+        "stats_cache": stats_cache.metrics(),
+        "stats_refresher": stats_refresher.metrics(),
+        "stats_stream": stats_broadcaster.metrics(),
+        "discord_gateway": discord_gateway.metrics(),
+        "discord_rate_limits": discord_rate_limiter.metrics(),
+        "oauth_callback": callback_timings.metrics(),
+        "membership_cache": membership_cache.metrics(),
+        "user_cache": user_cache.metrics(),
+        "token_cache": token_cache.metrics(),
+        "login_writer": login_writer.metrics(),
+        "trace_exporter": trace_exporter.metrics(),
+    }
 
 @api_router.get("/users")
-async def get_users(current_user: User = Depends(get_current_user)):
-    """Get all users (admin only)"""
+async def get_users(
+    limit: int = Query(USERS_PAGE_SIZE, ge=1, le=USERS_PAGE_MAX),
+    cursor: Optional[str] = None,
+    current_user: UserRecord = Depends(get_current_user)
+):
+    """Get a page of users, newest first (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    query = decode_users_cursor(cursor) if cursor else {}
+    
+    # Fetch one extra row to know whether another page follows
+    user_docs = await db.users.find(query, USER_PROJECTION).sort(USERS_SORT).limit(limit + 1).to_list(limit + 1)
+    users = [user_from_doc(user) for user in user_docs[:limit]]
+    next_cursor = encode_users_cursor(users[-1]) if len(user_docs) > limit else None
+    
+    return ORJSONResponse({"users": users, "next_cursor": next_cursor})
+
+@api_router.get("/users/export")
+async def export_users(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    fields: Optional[str] = None,
+    current_user: UserRecord = Depends(get_current_user)
+):
+    """Stream all users as NDJSON or CSV (admin only)"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    users = await db.users.find().to_list(1000)
-    return [User(**user) for user in users]
+    selected = [field.strip() for field in fields.split(",") if field.strip()] if fields else list(User.model_fields)
+    unknown = [field for field in selected if field not in User.model_fields]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        iter_users_export(selected, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'}
+    )
 
 @api_router.get("/users/{user_id}")
-async def get_user(user_id: str, current_user: User = Depends(get_current_user)):
+async def get_user(user_id: str, current_user: UserRecord = Depends(get_current_user)):
     """Get user by ID"""
     if not current_user.is_admin and current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    user_doc = await db.users.find_one({"id": user_id})
+    user_doc = await db.users.find_one({"id": user_id}, USER_PROJECTION)
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return User(**user_doc)
+    return ORJSONResponse(user_from_doc(user_doc))
 
 @api_router.delete("/users/{user_id}")
-async def delete_user(user_id: str, current_user: User = Depends(get_current_user)):
+async def delete_user(user_id: str, current_user: UserRecord = Depends(get_current_user)):
     """Delete user (admin only)"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
     result = await db.users.delete_one({"id": user_id})
+    user_cache.invalidate(user_id)
+    token_versions.set(user_id, -1)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     
     return {"message": "User deleted successfully"}
 
 @api_router.get("/admin/dashboard")
-async def admin_dashboard(current_user: User = Depends(get_current_user)):
+async def admin_dashboard(cached: bool = False, current_user: UserRecord = Depends(get_current_user)):
     """Get admin dashboard data"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    # Get user statistics
-    total_users = await db.users.count_documents({})
-    admin_users = await db.users.count_documents({"is_admin": True})
+    async def get_users_summary() -> Dict[str, Any]:
+        if cached:
+            # Periodically refreshed copy, falls back to a live aggregation until it exists
+            summary = await db.summaries.find_one({"_id": "users"}, {"_id": 0})
+            if summary:
+                return summary
+        return await aggregate_users_summary()
     
-    # Get recent users
-    recent_users = await db.users.find().sort("joined_at", -1).limit(10).to_list(10)
+    # Get user statistics and server stats concurrently
+    summary, server_stats = await asyncio.gather(get_users_summary(), get_server_stats())
     
-    # Get server stats
-    server_stats = await get_discord_server_stats()
-    
-    return {
-        "total_users": total_users,
-        "admin_users": admin_users,
-        "recent_users": [User(**user) for user in recent_users],
+    return ORJSONResponse({
+        "total_users": summary["total_users"],
+        "admin_users": summary["admin_users"],
+        "recent_users": [user_from_doc(user) for user in summary["recent_users"]],
         "server_stats": server_stats
-    }
+    })
 
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Get request, Discord and MongoDB metrics in the Prometheus text format (METRICS_TOKEN bearer only)"""
+    if not METRICS_ENABLED or not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    authorization = request.headers.get("authorization", "")
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.on_event("startup")
+async def startup_discord_client():
+    """Open the shared Discord HTTP client"""
+    global discord_http
+    discord_http = create_discord_http_client()
+
+@app.on_event("startup")
+async def startup_db_indexes():
+    """Create the users indexes, refusing to start on duplicate user ids"""
+    if MONGO_ENSURE_INDEXES:
+        await ensure_user_indexes()
+
+@app.on_event("startup")
+async def startup_stats_refresher():
+    """Start the background ServerStats refresher"""
+    if STATS_REFRESH_ENABLED:
+        stats_refresher.start()
+
+@app.on_event("startup")
+async def startup_discord_gateway():
+    """Connect to the Discord Gateway when enabled"""
+    if DISCORD_GATEWAY_ENABLED and DISCORD_BOT_TOKEN and DISCORD_GUILD_ID:
+        discord_gateway.start()
+
+@app.on_event("startup")
+async def startup_users_summary_refresher():
+    """Start the background users summary refresher"""
+    global users_summary_task
+    if USERS_SUMMARY_INTERVAL > 0:
+        users_summary_task = asyncio.create_task(run_users_summary_refresher())
+
+@app.on_event("startup")
+async def startup_login_writer():
+    """Start flushing batched login updates"""
+    if LOGIN_WRITE_BEHIND:
+        login_writer.start()
+
+@app.on_event("startup")
+async def startup_trace_exporter():
+    """Start exporting finished spans"""
+    trace_exporter.start()
+
+@app.on_event("shutdown")
+async def shutdown_stats_refresher():
+    """Stop the background ServerStats refresher"""
+    await stats_refresher.stop()
+
+@app.on_event("shutdown")
+async def shutdown_discord_gateway():
+    """Disconnect from the Discord Gateway"""
+    await discord_gateway.stop()
+
+@app.on_event("shutdown")
+async def shutdown_users_summary_refresher():
+    """Stop the background users summary refresher"""
+    if users_summary_task is not None:
+        users_summary_task.cancel()
+        try:
+            await users_summary_task
+        except asyncio.CancelledError:
+            pass
+
+@app.on_event("shutdown")
+async def shutdown_login_writer():
+    """Flush pending login updates before the database client closes"""
+    await login_writer.stop()
+
+@app.on_event("shutdown")
+async def shutdown_trace_exporter():
+    """Export spans still queued"""
+    await trace_exporter.stop()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """Shutdown database client"""
     client.close()
+    if discord_http is not None:
+        await discord_http.aclose()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+FDM Community fake Discord API
+Local stand-in for the Discord REST endpoints used by server.py, with
+configurable latency, per-bucket rate limits and injected 429 responses,
+for load testing and the backend tests
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+# Id returned for the "admin" OAuth code, matches ADMIN_USER_IDS in server.py
+ADMIN_ID = "449682043404812288"
+
+
+class FakeDiscord:
+    """Discord REST stand-in counting the calls it answers"""
+
+    def __init__(self, guild_id: str, latency: float = 0.0, jitter: float = 0.0,
+                 rate_limit_ratio: float = 0.0, retry_after: float = 0.1,
+                 member_count: int = 1200, channel_count: int = 48, role_count: int = 31,
+                 bucket_limit: int = 10000, bucket_reset_after: float = 1.0):
+        self.guild_id = guild_id
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.member_count = member_count
+        self.channel_count = channel_count
+        self.role_count = role_count
+        self.bucket_limit = bucket_limit
+        self.bucket_reset_after = bucket_reset_after
+        # Buckets answered with a 500, to simulate partial outages
+        self.failing_buckets = set()
+        self.requests = 0
+        self.rate_limited = 0
+        # Monotonic arrival time of every call
+        self.request_times = []
+        # (bucket, guild id, authorization) -> [window start, calls in the window]
+        self._windows = {}
+        self.app = Starlette(routes=[
+            Route("/oauth2/token", self.token, methods=["POST"]),
+            Route("/users/@me", self.current_user),
+            Route("/users/@me/guilds", self.current_user_guilds),
+            Route("/guilds/{guild_id}", self.guild),
+            Route("/guilds/{guild_id}/channels", self.channels),
+            Route("/guilds/{guild_id}/roles", self.roles),
+            Route("/guilds/{guild_id}/members/{user_id}", self.member),
+            Route("/_stats", self.stats),
+        ])
+
+    def metrics(self) -> dict:
+        """Get request counters"""
+        return {"requests": self.requests, "rate_limited": self.rate_limited}
+
+    async def respond(self, request: Request, bucket: str, content) -> JSONResponse:
+        """Answer after the configured latency, or with a 429 past the bucket limit or at the configured ratio"""
+        self.requests += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        # Like Discord, buckets are shared per major parameter and per token
+        now = time.monotonic()
+        self.request_times.append(now)
+        key = (bucket, request.path_params.get("guild_id"), request.headers.get("authorization"))
+        window = self._windows.get(key)
+        if window is None or now >= window[0] + self.bucket_reset_after:
+            window = self._windows[key] = [now, 0]
+        window[1] += 1
+        reset_after = window[0] + self.bucket_reset_after - now
+
+        headers = {
+            "X-RateLimit-Bucket": bucket,
+            "X-RateLimit-Limit": str(self.bucket_limit),
+            "X-RateLimit-Remaining": str(max(self.bucket_limit - window[1], 0)),
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+        }
+        if bucket in self.failing_buckets:
+            return JSONResponse({"message": "500: Internal Server Error", "code": 0}, status_code=500, headers=headers)
+        if window[1] > self.bucket_limit:
+            return self.too_many_requests(headers, reset_after)
+        if self.rate_limit_ratio and random.random() < self.rate_limit_ratio:
+            return self.too_many_requests(headers, self.retry_after)
+        return JSONResponse(content, headers=headers)
+
+    def too_many_requests(self, headers: dict, retry_after: float) -> JSONResponse:
+        self.rate_limited += 1
+        headers.update({"X-RateLimit-Remaining": "0", "Retry-After": f"{retry_after:.3f}"})
+        return JSONResponse(
+            {"message": "You are being rate limited.", "retry_after": round(retry_after, 3), "global": False},
+            status_code=429, headers=headers
+        )
+
+    @staticmethod
+    def user_id(request: Request) -> str:
+        """Map the bearer token back to the user id encoded in the OAuth code"""
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        code = token.removeprefix("token-")
+        if code == "admin":
+            return ADMIN_ID
+        return str(100000000000000000 + int(code)) if code.isdigit() else "100000000000000000"
+
+    async def token(self, request: Request) -> JSONResponse:
+        form = await request.form()
+        return await self.respond(request, "oauth-token", {
+            "access_token": f"token-{form.get('code')}",
+            "token_type": "Bearer",
+            "expires_in": 604800,
+            "scope": "identify email guilds",
+        })
+
+    async def current_user(self, request: Request) -> JSONResponse:
+        user_id = self.user_id(request)
+        return await self.respond(request, "users-me", {
+            "id": user_id,
+            "username": f"member{user_id[-6:]}",
+            "discriminator": "0",
+            "avatar": None,
+            "email": f"{user_id}@example.com",
+        })
+
+    async def current_user_guilds(self, request: Request) -> JSONResponse:
+        return await self.respond(request, "users-me-guilds", [{"id": self.guild_id, "name": "FDM"}])
+
+    async def guild(self, request: Request) -> JSONResponse:
+        return await self.respond(request, "guild", {
+            "id": self.guild_id,
+            "member_count": self.member_count,
+            "approximate_presence_count": self.member_count // 5,
+            "premium_subscription_count": 14,
+        })
+
+    async def channels(self, request: Request) -> JSONResponse:
+        return await self.respond(request, "guild-channels", [{"id": str(i)} for i in range(self.channel_count)])
+
+    async def roles(self, request: Request) -> JSONResponse:
+        return await self.respond(request, "guild-roles", [{"id": str(i)} for i in range(self.role_count)])
+
+    async def member(self, request: Request) -> JSONResponse:
+        return await self.respond(request, "guild-member", {"user": {"id": request.path_params["user_id"]}})
+
+    async def stats(self, request: Request) -> JSONResponse:
+        return JSONResponse(self.metrics())
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the fake Discord API on its own")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--guild-id", default="681602280893579342")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Random extra latency, in seconds")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Share of calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--bucket-limit", type=int, default=10000, help="Calls allowed per bucket window")
+    parser.add_argument("--bucket-reset-after", type=float, default=1.0, help="Bucket window length, in seconds")
+    args = parser.parse_args()
+
+    fake = FakeDiscord(args.guild_id, args.latency, args.jitter, args.rate_limit_ratio, args.retry_after,
+                       bucket_limit=args.bucket_limit, bucket_reset_after=args.bucket_reset_after)
+    uvicorn.run(fake.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
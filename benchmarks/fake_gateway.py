@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+FDM Community fake Discord Gateway
+Local stand-in for the bot Gateway used by DiscordGateway in server.py: answers
+IDENTIFY with READY and GUILD_CREATE, RESUME with RESUMED, acknowledges heartbeats
+and lets the caller push dispatch events, RECONNECT requests and close codes
+"""
+
+import json
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import websockets
+
+# Gateway opcodes
+DISPATCH = 0
+HEARTBEAT = 1
+IDENTIFY = 2
+RESUME = 6
+RECONNECT = 7
+HELLO = 10
+HEARTBEAT_ACK = 11
+
+
+class FakeGateway:
+    """Discord Gateway stand-in recording what the client sent"""
+
+    def __init__(self, guild_id: str, member_count: int = 10, channel_count: int = 3, role_count: int = 2,
+                 online_count: int = 2, heartbeat_interval: float = 41.25, ack_heartbeats: bool = True):
+        self.guild_id = guild_id
+        self.member_count = member_count
+        self.channel_count = channel_count
+        self.role_count = role_count
+        self.online_count = online_count
+        self.heartbeat_interval = heartbeat_interval
+        self.ack_heartbeats = ack_heartbeats
+        self.url: Optional[str] = None
+        self.session_id = "fake-session"
+        self.sequence = 0
+        self.connections = 0
+        self.identifies = []
+        self.resumes = []
+        self.heartbeats = 0
+        # Close code of every finished connection, as sent by whichever side closed it
+        self.close_codes = []
+        self._connection = None
+
+    @asynccontextmanager
+    async def serve(self, host: str = "127.0.0.1", port: int = 0):
+        """Listen for Gateway connections, yielding the URL to connect to"""
+        async with websockets.serve(self.handler, host, port) as server:
+            port = server.sockets[0].getsockname()[1]
+            self.url = f"ws://{host}:{port}"
+            yield f"{self.url}/?v=10&encoding=json"
+
+    def guild(self) -> dict:
+        """GUILD_CREATE payload for the configured counts"""
+        return {
+            "id": self.guild_id,
+            "member_count": self.member_count,
+            "premium_subscription_count": 14,
+            "channels": [{"id": f"channel-{i}"} for i in range(self.channel_count)],
+            "roles": [{"id": f"role-{i}"} for i in range(self.role_count)],
+            "presences": [
+                {"user": {"id": f"user-{i}"}, "status": "online"} for i in range(self.online_count)
+            ],
+        }
+
+    async def handler(self, connection):
+        self.connections += 1
+        self._connection = connection
+        await connection.send(json.dumps({"op": HELLO, "d": {"heartbeat_interval": self.heartbeat_interval * 1000}}))
+        try:
+            async for message in connection:
+                payload = json.loads(message)
+                if payload["op"] == IDENTIFY:
+                    self.identifies.append(payload["d"])
+                    self.sequence = 0
+                    await self.dispatch("READY", {"session_id": self.session_id, "resume_gateway_url": self.url})
+                    await self.dispatch("GUILD_CREATE", self.guild())
+                elif payload["op"] == RESUME:
+                    self.resumes.append(payload["d"])
+                    await self.dispatch("RESUMED", {})
+                elif payload["op"] == HEARTBEAT:
+                    self.heartbeats += 1
+                    if self.ack_heartbeats:
+                        await connection.send(json.dumps({"op": HEARTBEAT_ACK}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._connection = None
+            self.close_codes.append(connection.close_code)
+
+    async def dispatch(self, event: str, data: dict):
+        """Send a dispatch event on the current connection"""
+        self.sequence += 1
+        await self._connection.send(json.dumps({"op": DISPATCH, "s": self.sequence, "t": event, "d": data}))
+
+    async def request_reconnect(self):
+        """Ask the client to reconnect and resume"""
+        await self._connection.send(json.dumps({"op": RECONNECT, "d": None}))
+
+    async def close(self, code: int):
+        """Close the current connection with a Gateway close code"""
+        await self._connection.close(code=code)
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+FDM Community load test
+Runs server.app in-process against the fake Discord API and an in-memory or
+local MongoDB, drives concurrent load at each endpoint and reports latency
+percentiles and throughput, optionally saved as JSON and compared with a previous run
+
+Without --mongo-url the in-memory database needs mongomock-motor (backend/requirements-dev.txt)
+Other server settings (caches, compression, ...) are read from the environment as usual
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent / "backend"))
+
+import httpx
+import uvicorn
+
+from fake_discord import FakeDiscord
+
+GUILD_ID = "681602280893579342"
+SCENARIOS = ["stats", "stats_revalidate", "auth_me", "users", "dashboard", "callback"]
+
+
+def free_port() -> int:
+    """Get a free local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def load_server(discord_port: int, mongo_url: str, db_name: str):
+    """Import server.py configured for the fake Discord API"""
+    os.environ.update({
+        "DISCORD_API_BASE": f"http://127.0.0.1:{discord_port}",
+        "DISCORD_GUILD_ID": GUILD_ID,
+        "DISCORD_BOT_TOKEN": "load-test-bot",
+        "DISCORD_GATEWAY_ENABLED": "false",
+        "CLIENT_ID": "load-test",
+        "CLIENT_SECRET": "load-test",
+        "REDIRECT_URI": "http://127.0.0.1/callback",
+        "SESSION_SECRET": "load-test-session-secret-0123456789abcdef",
+        "MONGO_URL": mongo_url or "mongodb://127.0.0.1:27017",
+        "DB_NAME": db_name,
+    })
+    import server
+
+    # One log line per Discord call would dominate the measurements
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return server
+
+
+class MemoryCollection:
+    """mongomock-motor collection replaying bulk_write as single updates, mongomock rejects pymongo 4.9+ requests"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def bulk_write(self, requests, ordered=True):
+        # UpdateOne has no public accessors; _filter, _doc and _upsert are stable across
+        # pymongo 4.x, which backend/requirements-dev.txt pins for the tests and this benchmark
+        for request in requests:
+            await self._collection.update_one(request._filter, request._doc, upsert=request._upsert)
+
+
+class MemoryDatabase:
+    """In-memory stand-in for the Motor database"""
+
+    def __init__(self, database):
+        self._database = database
+
+    def __getattr__(self, name):
+        return MemoryCollection(getattr(self._database, name))
+
+
+def create_memory_database(db_name: str) -> MemoryDatabase:
+    """Create the in-memory database, exiting with a hint if mongomock-motor is missing"""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("The in-memory database needs mongomock-motor (pip install -r backend/requirements-dev.txt), "
+                 "or pass --mongo-url")
+    return MemoryDatabase(AsyncMongoMockClient()[db_name])
+
+
+class BackgroundServers:
+    """Runs the fake Discord API and the app on their own event loop thread"""
+
+    def __init__(self, app, discord_app, app_port: int, discord_port: int):
+        self.discord = uvicorn.Server(uvicorn.Config(
+            discord_app, host="127.0.0.1", port=discord_port, log_level="warning", access_log=False, lifespan="off"
+        ))
+        self.app = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=app_port, log_level="warning", access_log=False
+        ))
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(self._serve(),), daemon=True)
+
+    def start(self):
+        """Start both servers and wait until the app has run its startup hooks"""
+        self.thread.start()
+        while not self.app.started:
+            if not self.thread.is_alive():
+                sys.exit("Server failed to start")
+            time.sleep(0.05)
+
+    def stop(self):
+        """Run the app shutdown hooks and stop both servers"""
+        self.app.should_exit = True
+        self.thread.join(30)
+
+    def call(self, coro):
+        """Run a coroutine on the servers' event loop, where Motor is bound"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _serve(self):
+        discord_task = asyncio.create_task(self.discord.serve())
+        while not self.discord.started:
+            await asyncio.sleep(0.01)
+        try:
+            await self.app.serve()
+        finally:
+            self.discord.should_exit = True
+            await discord_task
+
+
+async def reset_database(server):
+    """Drop the collections the load test writes to"""
+    await server.db.users.delete_many({})
+    await server.db.summaries.delete_many({})
+
+
+def percentile(sorted_values: list, pct: float):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list, statuses: Counter, elapsed: float) -> dict:
+    """Build the report entry of one scenario"""
+    latencies.sort()
+    as_ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": as_ms(percentile(latencies, 50)),
+        "p95_ms": as_ms(percentile(latencies, 95)),
+        "p99_ms": as_ms(percentile(latencies, 99)),
+        "max_ms": as_ms(latencies[-1] if latencies else None),
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "errors": sum(count for status, count in statuses.items() if status == "error" or status >= 500),
+    }
+
+
+async def drive(client: httpx.AsyncClient, make_request, concurrency: int, duration: float) -> dict:
+    """Keep concurrency requests in flight for duration seconds"""
+    latencies = []
+    statuses = Counter()
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            method, path, headers = make_request()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, headers=headers)
+            except httpx.HTTPError:
+                statuses["error"] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+async def login(client: httpx.AsyncClient, code: str, attempts: int = 5) -> str:
+    """Go through the OAuth callback and return the JWT, retrying calls failed by injected 429s"""
+    for _ in range(attempts - 1):
+        response = await client.get("/api/auth/callback", params={"code": code})
+        if response.status_code == 200:
+            return response.json()["access_token"]
+    response = await client.get("/api/auth/callback", params={"code": code})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_load(args, app_port: int, fake: FakeDiscord) -> tuple:
+    """Run every requested scenario and collect its results and the server metrics"""
+    # Session cookies set by the callback would otherwise ride along on every request
+    cookies = CookieJar(policy=DefaultCookiePolicy(allowed_domains=()))
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{app_port}",
+        limits=httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency),
+        timeout=args.timeout,
+        cookies=cookies,
+    ) as client:
+        admin_token = await login(client, "admin")
+        tokens = [await login(client, str(i)) for i in range(min(args.oauth_users, 50))]
+        etag = (await client.get("/api/stats")).headers.get("etag", "")
+
+        admin = {"Authorization": f"Bearer {admin_token}"}
+        scenarios = {
+            "stats": lambda: ("GET", "/api/stats", {}),
+            "stats_revalidate": lambda: ("GET", "/api/stats", {"If-None-Match": etag}),
+            "auth_me": lambda: ("GET", "/api/auth/me", {"Authorization": f"Bearer {random.choice(tokens)}"}),
+            "users": lambda: ("GET", f"/api/users?limit={args.page_size}", admin),
+            "dashboard": lambda: ("GET", "/api/admin/dashboard", admin),
+            "callback": lambda: ("GET", f"/api/auth/callback?code={random.randrange(args.oauth_users)}", {}),
+        }
+
+        results = {}
+        for name in args.scenarios:
+            if args.warmup:
+                await drive(client, scenarios[name], args.concurrency, args.warmup)
+            before = fake.metrics()
+            result = await drive(client, scenarios[name], args.concurrency, args.duration)
+            after = fake.metrics()
+            result["discord_requests"] = after["requests"] - before["requests"]
+            result["discord_rate_limited"] = after["rate_limited"] - before["rate_limited"]
+            results[name] = result
+            print_result(name, result)
+
+        metrics = await client.get("/api/metrics", headers=admin)
+        metrics.raise_for_status()
+        return results, metrics.json()
+
+
+def print_header():
+    print(f"{'scenario':18} {'requests':>9} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'max ms':>9} {'errors':>7} {'discord':>8} {'429s':>6}")
+
+
+def print_result(name: str, result: dict):
+    fmt = lambda value: "-" if value is None else f"{value:.2f}"
+    print(f"{name:18} {result['requests']:9d} {result['rps']:9.1f} {fmt(result['p50_ms']):>9} "
+          f"{fmt(result['p95_ms']):>9} {fmt(result['p99_ms']):>9} {fmt(result['max_ms']):>9} "
+          f"{result['errors']:7d} {result['discord_requests']:8d} {result['discord_rate_limited']:6d}")
+
+
+def print_comparison(results: dict, baseline: dict):
+    """Print throughput and latency changes against a previous run"""
+    print(f"\ncompared with {baseline['meta'].get('started_at')} ({baseline['meta'].get('commit') or 'unknown commit'})")
+    for name, result in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        changes = []
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            if result[key] is None or not previous.get(key):
+                continue
+            changes.append(f"{key} {previous[key]:.2f} -> {result[key]:.2f} ({(result[key] / previous[key] - 1) * 100:+.1f}%)")
+        print(f"{name:18} " + "  ".join(changes))
+
+
+def git_commit() -> str:
+    """Short hash of the checked out commit, if any"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against a fake Discord")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load per scenario")
+    parser.add_argument("--warmup", type=float, default=1, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--users", type=int, default=1000, help="Users documents seeded before the run")
+    parser.add_argument("--oauth-users", type=int, default=200, help="Distinct Discord accounts logging in")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--discord-latency", type=float, default=0.05, help="Seconds added to every Discord response")
+    parser.add_argument("--discord-jitter", type=float, default=0.02)
+    parser.add_argument("--discord-429-ratio", type=float, default=0.0, help="Share of Discord calls answered with 429")
+    parser.add_argument("--discord-retry-after", type=float, default=0.1)
+    parser.add_argument("--mongo-url", help="Use this MongoDB instead of the in-memory stand-in")
+    parser.add_argument("--db-name", default="fdm_load_test")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare with the JSON results of a previous run")
+    args = parser.parse_args()
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+
+    discord_port, app_port = free_port(), free_port()
+    server = load_server(discord_port, args.mongo_url, args.db_name)
+    if not args.mongo_url:
+        server.db = create_memory_database(args.db_name)
+
+    fake = FakeDiscord(
+        GUILD_ID,
+        latency=args.discord_latency,
+        jitter=args.discord_jitter,
+        rate_limit_ratio=args.discord_429_ratio,
+        retry_after=args.discord_retry_after,
+    )
+    servers = BackgroundServers(server.app, fake.app, app_port, discord_port)
+    servers.start()
+
+    started_at = datetime.utcnow()
+    try:
+        from projections import make_user_docs
+
+        servers.call(reset_database(server))
+        if args.users:
+            servers.call(server.db.users.insert_many(make_user_docs(args.users)))
+        print(f"{args.users} users, concurrency {args.concurrency}, {args.duration:g}s per scenario, "
+              f"Discord latency {args.discord_latency * 1000:g} ms, 429 ratio {args.discord_429_ratio:g}")
+        print_header()
+        results, metrics = asyncio.run(run_load(args, app_port, fake))
+        servers.call(reset_database(server))
+    finally:
+        servers.stop()
+
+    report = {
+        "meta": {
+            "started_at": started_at.isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "results": results,
+        "server_metrics": metrics,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, default=str))
+        print(f"\nresults written to {args.output}")
+    if baseline is not None:
+        print_comparison(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
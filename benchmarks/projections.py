@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+FDM Community users projection benchmark
+Compares reading whole users documents with reading USER_PROJECTION only,
+and validated User construction with the trusted user_from_doc path
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import bson
+import server
+
+
+def make_user_docs(count: int) -> list:
+    """Build users documents shaped like the ones the OAuth callback writes"""
+    joined = datetime(2024, 1, 1)
+    return [
+        {
+            "_id": bson.ObjectId(),
+            "id": str(100000000000000000 + i),
+            "username": f"member{i}",
+            "discriminator": "0",
+            "avatar": "a_" + "f" * 30,
+            "email": f"member{i}@example.com",
+            "is_admin": False,
+            "last_login": joined + timedelta(days=30, seconds=i),
+            "joined_at": joined + timedelta(seconds=i),
+            "token_version": 0,
+        }
+        for i in range(count)
+    ]
+
+
+def project(doc: dict) -> dict:
+    """Apply USER_PROJECTION the way Mongo would"""
+    return {key: value for key, value in doc.items() if server.USER_PROJECTION.get(key)}
+
+
+def best_of(func, repeat: int) -> float:
+    """Best wall time in milliseconds over several runs"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def bench_offline(docs: list, repeat: int):
+    """Measure wire size, BSON decode and User construction without a server"""
+    full_payload = b"".join(bson.encode(doc) for doc in docs)
+    projected_payload = b"".join(bson.encode(project(doc)) for doc in docs)
+
+    for label, payload in (("full documents", full_payload), ("USER_PROJECTION", projected_payload)):
+        decode_ms = best_of(lambda: bson.decode_all(payload), repeat)
+        decoded = bson.decode_all(payload)
+        build_ms = best_of(lambda: [server.User(**doc) for doc in decoded], repeat)
+        line = f"{label:16} {len(payload) / 1024:9.1f} KiB  decode {decode_ms:7.2f} ms  User() {build_ms:7.2f} ms"
+        if payload is projected_payload:
+            # user_from_doc expects exactly the projected User fields
+            trusted_ms = best_of(lambda: [server.user_from_doc(doc) for doc in decoded], repeat)
+            line += f"  user_from_doc() {trusted_ms:7.2f} ms"
+        print(line)
+
+
+async def bench_mongo(docs: list, mongo_url: str, repeat: int):
+    """Measure find().to_list() against a real MongoDB"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    mongo = AsyncIOMotorClient(mongo_url)
+    collection = mongo["fdm_benchmark"]["users"]
+    await collection.drop()
+    await collection.insert_many(docs)
+    try:
+        for label, projection in (("full documents", None), ("USER_PROJECTION", server.USER_PROJECTION)):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                await collection.find({}, projection).to_list(None)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"{label:16} find().to_list() {min(timings):8.2f} ms")
+    finally:
+        await collection.drop()
+        mongo.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark users reads with and without projections")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mongo-url", help="Also measure round trips against this MongoDB")
+    args = parser.parse_args()
+
+    docs = make_user_docs(args.users)
+    print(f"{args.users} users")
+    bench_offline(docs, args.repeat)
+    if args.mongo_url:
+        asyncio.run(bench_mongo(docs, args.mongo_url, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+FDM Community response serialization benchmark
+Compares FastAPI's default JSONResponse path (jsonable_encoder + json.dumps)
+with the orjson-backed ORJSONResponse used by server.py
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import server
+
+
+def make_users_page(count: int) -> dict:
+    """Build a GET /api/users page of User models"""
+    joined = datetime(2024, 1, 1)
+    users = [
+        server.User(
+            id=str(100000000000000000 + i),
+            username=f"member{i}",
+            discriminator="0",
+            avatar="a_" + "f" * 30,
+            email=f"member{i}@example.com",
+            joined_at=joined + timedelta(seconds=i),
+            last_login=joined + timedelta(days=30, seconds=i),
+        )
+        for i in range(count)
+    ]
+    return {"users": users, "next_cursor": None}
+
+
+def make_stats() -> server.ServerStats:
+    """Build a GET /api/stats payload"""
+    return server.ServerStats(member_count=1200, online_count=240, boost_count=14, channel_count=48, role_count=31)
+
+
+def per_call_us(func, iterations: int, repeat: int) -> float:
+    """Best per-call time in microseconds over several runs"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = (time.perf_counter() - started) / iterations * 1_000_000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compare(label: str, content, iterations: int, repeat: int):
+    """Print default vs orjson serialization cost for one payload"""
+    default_us = per_call_us(lambda: JSONResponse(jsonable_encoder(content)), iterations, repeat)
+    orjson_us = per_call_us(lambda: server.ORJSONResponse(content), iterations, repeat)
+    size = len(server.ORJSONResponse(content).body)
+    print(f"{label:18} {size / 1024:8.1f} KiB  default {default_us:10.1f} us  "
+          f"orjson {orjson_us:10.1f} us  speedup {default_us / orjson_us:5.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON serialization of hot endpoints")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    compare(f"/api/users ({args.users})", make_users_page(args.users), args.iterations, args.repeat)
+    compare("/api/stats", make_stats(), args.iterations * 100, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+FDM Community token verification micro-benchmark
+Compares a full HS256 jwt.decode with a verified-token cache hit
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import jwt
+import server
+
+
+def per_call_us(stmt, number: int, repeat: int) -> float:
+    """Best per-call time in microseconds over several runs"""
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark verify_token with and without the token cache")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    token = server.create_access_token("449682043404812288")
+
+    decode_us = per_call_us(
+        lambda: jwt.decode(token, server.SESSION_SECRET, algorithms=["HS256"]),
+        args.iterations, args.repeat
+    )
+
+    def cold_verify():
+        server.token_cache.clear()
+        server.verify_token(token)
+
+    miss_us = per_call_us(cold_verify, args.iterations, args.repeat)
+
+    server.verify_token(token)
+    hit_us = per_call_us(lambda: server.verify_token(token), args.iterations, args.repeat)
+
+    print(f"jwt.decode             {decode_us:8.2f} us/call")
+    print(f"verify_token (miss)    {miss_us:8.2f} us/call")
+    print(f"verify_token (hit)     {hit_us:8.2f} us/call")
+    print(f"speedup on hit         {decode_us / hit_us:8.1f}x")
+    print(f"cache metrics          {server.token_cache.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -88,17 +88,43 @@ function LandingPage() {
   const [onlineCount, setOnlineCount] = useState(95);
 
   useEffect(() => {
-    fetchStats();
-    // Update online count every 30 seconds
-    const interval = setInterval(fetchStats, 30000);
-    return () => clearInterval(interval);
+    // Live updates pushed by the server, polling every 30 seconds as a fallback
+    let interval = null;
+    const startPolling = () => {
+      if (!interval) {
+        fetchStats();
+        interval = setInterval(fetchStats, 30000);
+      }
+    };
+
+    let source = null;
+    if (window.EventSource) {
+      source = new EventSource(`${API}/stats/stream`);
+      source.addEventListener('stats', (event) => applyStats(JSON.parse(event.data)));
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+          startPolling();
+        }
+      };
+    } else {
+      startPolling();
+    }
+
+    return () => {
+      if (source) source.close();
+      if (interval) clearInterval(interval);
+    };
   }, []);
 
+  const applyStats = (data) => {
+    setStats(data);
+    setOnlineCount(data.member_count || 95);
+  };
+
   const fetchStats = async () => {
     try {
       const response = await axios.get(`${API}/stats`);
-      setStats(response.data);
-      setOnlineCount(response.data.member_count || 95);
+      applyStats(response.data);
     } catch (error) {
       console.error('Failed to fetch stats:', error);
     }
@@ -0,0 +1,67 @@
+"""
+FDM Community backend tests
+server.py runs against the fake Discord API from benchmarks/ and a
+mongomock-motor database, see backend/requirements-dev.txt
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT_DIR / "backend"), str(ROOT_DIR / "benchmarks")]
+
+GUILD_ID = "681602280893579342"
+
+# Must be set before server.py is imported, load_dotenv keeps existing variables
+os.environ.update({
+    "DISCORD_API_BASE": "http://discord.test",
+    "DISCORD_GUILD_ID": GUILD_ID,
+    "DISCORD_BOT_TOKEN": "test-bot",
+    "DISCORD_GATEWAY_ENABLED": "false",
+    "CLIENT_ID": "test",
+    "CLIENT_SECRET": "test",
+    "REDIRECT_URI": "http://127.0.0.1/callback",
+    "SESSION_SECRET": "test-session-secret-0123456789abcdef",
+    "MONGO_URL": "mongodb://127.0.0.1:27017",
+    "DB_NAME": "fdm_test",
+})
+
+import server  # noqa: E402
+from fake_discord import FakeDiscord  # noqa: E402
+from load_test import create_memory_database  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Start every test with empty caches and a fresh rate limiter"""
+    for cache in (server.token_cache, server.token_versions, server.user_cache, server.membership_cache):
+        cache.clear()
+    monkeypatch.setattr(server, "discord_rate_limiter", server.DiscordRateLimiter(
+        global_limit=server.DISCORD_RATE_LIMIT_GLOBAL,
+        max_wait=server.DISCORD_RATE_LIMIT_MAX_WAIT,
+        max_retries=server.DISCORD_RATE_LIMIT_MAX_RETRIES,
+        max_buckets=server.DISCORD_RATE_LIMIT_BUCKETS,
+    ))
+    monkeypatch.setattr(server, "discord_http", None)
+
+
+@pytest.fixture
+def fake_discord(monkeypatch):
+    """Fake Discord API answering server.py's Discord calls in-process"""
+    fake = FakeDiscord(GUILD_ID)
+    monkeypatch.setattr(server, "create_discord_http_client", lambda: httpx.AsyncClient(
+        base_url=server.DISCORD_API_BASE, transport=httpx.ASGITransport(app=fake.app)
+    ))
+    return fake
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """In-memory database replacing the Motor one"""
+    database = create_memory_database("fdm_test")
+    monkeypatch.setattr(server, "db", database)
+    return database
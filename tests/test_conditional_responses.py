@@ -0,0 +1,50 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.fixture
+def client(monkeypatch, fake_discord, db):
+    monkeypatch.setattr(server, "JWT_CLAIMS_MODE", True)
+    monkeypatch.setattr(server, "COMPRESSION_MINIMUM_SIZE", 0)
+    test_client = TestClient(server.app)
+    response = test_client.get("/api/auth/callback", params={"code": "1"})
+    test_client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    return test_client
+
+
+def test_auth_me_encodings_have_their_own_etags(client):
+    plain = client.get("/api/auth/me", headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/api/auth/me", headers={"Accept-Encoding": "gzip"})
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    assert compressed.json() == plain.json()
+    assert "Accept-Encoding" in compressed.headers["Vary"] and "Authorization" in compressed.headers["Vary"]
+
+
+def test_auth_me_revalidates_with_either_etag(client):
+    plain = client.get("/api/auth/me", headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/api/auth/me", headers={"Accept-Encoding": "gzip"})
+
+    for etag in (plain.headers["ETag"], compressed.headers["ETag"]):
+        response = client.get("/api/auth/me", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+
+def test_auth_me_uses_the_configured_level(client, monkeypatch):
+    levels = []
+    compress = gzip.compress
+
+    def recording_compress(body, compresslevel, mtime):
+        levels.append(compresslevel)
+        return compress(body, compresslevel, mtime=mtime)
+
+    monkeypatch.setattr(gzip, "compress", recording_compress)
+
+    client.get("/api/auth/me", headers={"Accept-Encoding": "gzip"})
+    assert levels == [server.COMPRESSION_GZIP_LEVEL]
@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import pytest
+
+import server
+from conftest import GUILD_ID
+from fake_gateway import FakeGateway
+
+
+async def wait_until(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def refresher(monkeypatch, fake_discord):
+    """Stats refresher polling the fake Discord API whenever the gateway is not ready"""
+    stats_refresher = server.StatsRefresher(server.StatsCache(ttl=0, stale_ttl=0), interval=0.05, max_backoff=1)
+    monkeypatch.setattr(server, "stats_refresher", stats_refresher)
+    return stats_refresher
+
+
+def run_gateway(monkeypatch, fake: FakeGateway, scenario):
+    """Connect a DiscordGateway to the fake one and run scenario(gateway)"""
+    async def main():
+        async with fake.serve() as url:
+            gateway = server.DiscordGateway(url, server.GATEWAY_INTENTS, publish_interval=0.02)
+            monkeypatch.setattr(server, "discord_gateway", gateway)
+            gateway.start()
+            try:
+                await wait_until(lambda: gateway.is_ready)
+                await scenario(gateway)
+            finally:
+                await gateway.stop()
+                await server.stats_refresher.stop()
+
+    asyncio.run(main())
+
+
+def test_identify_loads_guild_counts(monkeypatch, refresher):
+    fake = FakeGateway(GUILD_ID, member_count=10, channel_count=3, role_count=2, online_count=2)
+
+    async def scenario(gateway):
+        assert len(fake.identifies) == 1
+        assert fake.identifies[0]["intents"] == server.GATEWAY_INTENTS
+        assert fake.identifies[0]["token"] == server.DISCORD_BOT_TOKEN
+
+        await wait_until(lambda: refresher.snapshot is not None)
+        assert server.stats_counts(refresher.snapshot) == {
+            "member_count": 10, "online_count": 2, "boost_count": 14,
+            "channel_count": 3, "role_count": 2, "degraded": False,
+        }
+
+    run_gateway(monkeypatch, fake, scenario)
+
+
+def test_dispatch_events_update_counts(monkeypatch, refresher):
+    fake = FakeGateway(GUILD_ID, member_count=10, channel_count=3, role_count=2, online_count=2)
+
+    async def scenario(gateway):
+        await fake.dispatch("GUILD_MEMBER_ADD", {"guild_id": GUILD_ID, "user": {"id": "new"}})
+        await fake.dispatch("GUILD_MEMBER_ADD", {"guild_id": GUILD_ID, "user": {"id": "newer"}})
+        await fake.dispatch("GUILD_MEMBER_REMOVE", {"guild_id": GUILD_ID, "user": {"id": "user-0"}})
+        await fake.dispatch("PRESENCE_UPDATE", {"guild_id": GUILD_ID, "user": {"id": "new"}, "status": "idle"})
+        await fake.dispatch("PRESENCE_UPDATE", {"guild_id": GUILD_ID, "user": {"id": "user-1"}, "status": "offline"})
+        await fake.dispatch("CHANNEL_CREATE", {"guild_id": GUILD_ID, "id": "channel-new"})
+        await fake.dispatch("CHANNEL_DELETE", {"guild_id": GUILD_ID, "id": "channel-0"})
+        await fake.dispatch("CHANNEL_DELETE", {"guild_id": GUILD_ID, "id": "channel-1"})
+        await fake.dispatch("GUILD_ROLE_CREATE", {"guild_id": GUILD_ID, "role": {"id": "role-new"}})
+        # Events of other guilds the bot is in are ignored
+        await fake.dispatch("CHANNEL_CREATE", {"guild_id": "other-guild", "id": "elsewhere"})
+        await fake.dispatch("GUILD_MEMBER_ADD", {"guild_id": "other-guild", "user": {"id": "elsewhere"}})
+
+        await wait_until(lambda: gateway.sequence == fake.sequence)
+        expected = {
+            "member_count": 11, "online_count": 1, "boost_count": 14,
+            "channel_count": 2, "role_count": 3, "degraded": False,
+        }
+        assert server.stats_counts(gateway.to_stats()) == expected
+        await wait_until(lambda: refresher.snapshot is not None and server.stats_counts(refresher.snapshot) == expected)
+
+    run_gateway(monkeypatch, fake, scenario)
+
+
+def test_reconnect_resumes_the_session(monkeypatch, refresher):
+    fake = FakeGateway(GUILD_ID)
+
+    async def scenario(gateway):
+        await fake.dispatch("CHANNEL_CREATE", {"guild_id": GUILD_ID, "id": "channel-new"})
+        await wait_until(lambda: gateway.sequence == fake.sequence)
+        await fake.request_reconnect()
+
+        await wait_until(lambda: fake.resumes and gateway.is_ready)
+        assert fake.resumes == [{"token": server.DISCORD_BOT_TOKEN, "session_id": fake.session_id, "seq": 3}]
+        assert len(fake.identifies) == 1 and fake.connections == 2
+        # Resuming keeps the counts built before the reconnect
+        assert len(gateway.channels) == fake.channel_count + 1
+
+    run_gateway(monkeypatch, fake, scenario)
+
+
+def test_fatal_close_code_falls_back_to_rest(monkeypatch, refresher, fake_discord):
+    fake = FakeGateway(GUILD_ID, member_count=10)
+
+    async def scenario(gateway):
+        refresher.start()
+        await asyncio.sleep(0.1)
+        # No REST polling while the gateway keeps the counts current
+        assert fake_discord.requests == 0
+
+        await fake.close(4014)  # Disallowed intents
+        await wait_until(lambda: gateway._tasks[0].done())
+        assert not gateway.is_ready
+        await wait_until(lambda: refresher.snapshot is not None
+                         and refresher.snapshot.member_count == fake_discord.member_count)
+        assert fake.connections == 1
+
+    run_gateway(monkeypatch, fake, scenario)
+
+
+def test_zombie_connection_is_closed_and_resumed(monkeypatch, refresher):
+    fake = FakeGateway(GUILD_ID, heartbeat_interval=0.05, ack_heartbeats=False)
+
+    async def scenario(gateway):
+        await wait_until(lambda: fake.close_codes)
+        assert fake.close_codes == [4000]
+        assert fake.heartbeats == 1
+
+        fake.ack_heartbeats = True
+        await wait_until(lambda: fake.resumes and gateway.is_ready)
+        assert len(fake.identifies) == 1
+
+    run_gateway(monkeypatch, fake, scenario)
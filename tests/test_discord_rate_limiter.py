@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import pytest
+
+import server
+from conftest import GUILD_ID
+
+BOT = {"Authorization": "Bot test-bot"}
+
+
+@pytest.fixture
+def limiter(monkeypatch, fake_discord):
+    def create(**settings) -> server.DiscordRateLimiter:
+        rate_limiter = server.DiscordRateLimiter(**{
+            "global_limit": 50, "max_wait": 10, "max_retries": 3, "max_buckets": 100, **settings
+        })
+        monkeypatch.setattr(server, "discord_rate_limiter", rate_limiter)
+        return rate_limiter
+    return create
+
+
+async def get_member(user_id: int, headers: dict = BOT):
+    return await server.discord_request("GET", f"/guilds/{GUILD_ID}/members/{user_id}", headers=headers)
+
+
+async def get_members(count: int, headers: dict = BOT) -> list:
+    return await asyncio.gather(*(get_member(i, headers) for i in range(count)))
+
+
+def test_bucket_state_follows_response_headers(limiter, fake_discord):
+    rate_limiter = limiter()
+    fake_discord.bucket_limit = 5
+    fake_discord.bucket_reset_after = 2
+
+    asyncio.run(get_members(2))
+
+    metrics = rate_limiter.metrics()
+    assert metrics["routes"] == {"GET /guilds/{id}/members/{id}": "guild-member"}
+    bucket = metrics["buckets"][f"guild-member|{GUILD_ID}"]
+    assert (bucket["limit"], bucket["remaining"]) == (5, 3)
+    assert 1.5 < bucket["reset_in"] <= 2
+
+
+def test_calls_queue_for_the_bucket_reset(limiter, fake_discord):
+    rate_limiter = limiter()
+    fake_discord.latency = 0.02
+    fake_discord.bucket_limit = 2
+    fake_discord.bucket_reset_after = 0.3
+
+    async def scenario():
+        await get_member(0)
+        started = time.monotonic()
+        responses = await get_members(5)
+        return responses, time.monotonic() - started
+
+    responses, elapsed = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200] * 5
+    # One call was left in the first window, then two per window
+    assert fake_discord.rate_limited == 0
+    assert elapsed >= 0.55
+    assert rate_limiter.throttled >= 2
+
+
+def test_429_is_retried_after_retry_after(limiter, fake_discord):
+    rate_limiter = limiter()
+    fake_discord.latency = 0.02
+    fake_discord.bucket_limit = 1
+    fake_discord.bucket_reset_after = 0.2
+
+    async def scenario():
+        started = time.monotonic()
+        # Both calls leave before Discord announced the bucket, so one of them gets a 429
+        responses = await get_members(2)
+        return responses, time.monotonic() - started
+
+    responses, elapsed = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200, 200]
+    assert fake_discord.rate_limited == rate_limiter.rate_limited == 1
+    assert elapsed >= 0.15
+
+
+def test_repeated_429_raises_503(limiter, fake_discord):
+    rate_limiter = limiter(max_retries=2)
+    fake_discord.rate_limit_ratio = 1.0
+    fake_discord.retry_after = 0.05
+
+    with pytest.raises(server.DiscordRateLimited) as raised:
+        asyncio.run(get_member(0))
+    assert raised.value.status_code == 503
+    assert fake_discord.requests == 3
+    assert rate_limiter.rejected == 1
+
+
+def test_wait_longer_than_max_wait_raises_503(limiter, fake_discord):
+    rate_limiter = limiter(max_wait=0.5)
+    fake_discord.bucket_limit = 1
+    fake_discord.bucket_reset_after = 5
+
+    async def scenario():
+        await get_member(0)
+        await get_member(1)
+
+    with pytest.raises(server.DiscordRateLimited) as raised:
+        asyncio.run(scenario())
+    assert raised.value.status_code == 503
+    assert int(raised.value.headers["Retry-After"]) >= 5
+    # Rejected without spending a call on a certain 429
+    assert fake_discord.requests == 1
+    assert rate_limiter.rejected == 1
+
+
+def test_global_limit_spreads_bot_calls_over_seconds(limiter, fake_discord):
+    rate_limiter = limiter(global_limit=4)
+
+    async def scenario():
+        started = time.monotonic()
+        await get_members(6)
+        bot_elapsed = time.monotonic() - started
+        started = time.monotonic()
+        # OAuth bearer calls are limited per user token, not by the bot's global limit
+        await get_members(6, headers={"Authorization": "Bearer user-token"})
+        return bot_elapsed, time.monotonic() - started
+
+    bot_elapsed, bearer_elapsed = asyncio.run(scenario())
+    first = fake_discord.request_times[0]
+    assert sum(1 for at in fake_discord.request_times[:6] if at - first < 1) == 4
+    assert bot_elapsed >= 0.9
+    assert bearer_elapsed < 0.5
+    assert rate_limiter.throttled >= 1
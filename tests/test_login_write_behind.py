@@ -0,0 +1,133 @@
+import asyncio
+from datetime import datetime
+
+import httpx
+import pytest
+
+import load_test
+import server
+from fake_discord import ADMIN_ID
+
+USER_ID = "100000000000000001"
+
+
+@pytest.fixture
+def writer(monkeypatch, fake_discord, db):
+    login_writer = server.LoginWriteBehind(interval=60, max_pending=100)
+    monkeypatch.setattr(server, "login_writer", login_writer)
+    return login_writer
+
+
+async def login(code: str) -> dict:
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app.test") as client:
+        response = await client.get("/api/auth/callback", params={"code": code})
+    assert response.status_code == 200
+    return response.json()
+
+
+async def stored_user(user_id: str) -> dict:
+    return await server.db.users.find_one({"id": user_id})
+
+
+def last_login(login_response: dict) -> datetime:
+    """last_login of a callback response as Mongo stores it, to the millisecond"""
+    value = datetime.fromisoformat(login_response["user"]["last_login"])
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def test_returning_logins_coalesce_into_one_write(writer):
+    async def scenario():
+        writer.start()
+        first = await login("1")
+        # First logins are written before the token is issued
+        assert (await stored_user(USER_ID))["last_login"] == last_login(first)
+
+        await login("1")
+        latest = await login("1")
+        assert writer.metrics()["pending"] == 1
+        assert writer.coalesced == 1
+        assert (await stored_user(USER_ID))["last_login"] == last_login(first)
+
+        await writer.stop()
+        assert writer.flushes == 1 and writer.written == 1
+        assert (await stored_user(USER_ID))["last_login"] == last_login(latest)
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_flushes_before_the_interval(writer):
+    writer.max_pending = 2
+
+    async def scenario():
+        writer.start()
+        writer.enqueue("1", {"username": "one"})
+        writer.enqueue("2", {"username": "two"})
+        await asyncio.sleep(0.05)
+        assert writer.flushes == 1 and writer.metrics()["pending"] == 0
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_failed_flush_requeues_under_newer_updates(writer, monkeypatch):
+    async def scenario():
+        await server.db.users.insert_one({"id": "1", "username": "old", "email": "old@example.com"})
+        bulk_write = load_test.MemoryCollection.bulk_write
+
+        async def failing_bulk_write(self, requests, ordered=True):
+            raise RuntimeError("primary stepped down")
+
+        monkeypatch.setattr(load_test.MemoryCollection, "bulk_write", failing_bulk_write)
+        writer.enqueue("1", {"username": "first", "email": "first@example.com"})
+        await writer.flush()
+        assert writer.errors == 1 and writer.metrics()["pending"] == 1
+
+        monkeypatch.setattr(load_test.MemoryCollection, "bulk_write", bulk_write)
+        writer.enqueue("1", {"username": "second"})
+        await writer.flush()
+        user = await stored_user("1")
+        assert (user["username"], user["email"]) == ("second", "first@example.com")
+
+    asyncio.run(scenario())
+
+
+def test_demotion_is_written_immediately(writer, monkeypatch):
+    async def scenario():
+        writer.start()
+        await login("admin")
+        version = (await stored_user(ADMIN_ID))["token_version"]
+        monkeypatch.setattr(server, "ADMIN_USER_IDS", [])
+        await login("admin")
+
+        assert writer.metrics()["pending"] == 0
+        user = await stored_user(ADMIN_ID)
+        assert user["is_admin"] is False and user["token_version"] == version + 1
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_stop_waits_for_the_flush_in_progress(writer, monkeypatch):
+    bulk_write = load_test.MemoryCollection.bulk_write
+
+    async def slow_bulk_write(self, requests, ordered=True):
+        await asyncio.sleep(0.1)
+        await bulk_write(self, requests, ordered)
+
+    monkeypatch.setattr(load_test.MemoryCollection, "bulk_write", slow_bulk_write)
+    writer.max_pending = 1
+
+    async def scenario():
+        await server.db.users.insert_one({"id": "1", "username": "old"})
+        writer.start()
+        writer.enqueue("1", {"username": "new"})
+        await asyncio.sleep(0.02)
+        # The loop has taken the batch and is waiting on Mongo
+        assert writer.metrics()["pending"] == 0 and writer.flushes == 0
+
+        await writer.stop()
+        assert writer.written == 1 and writer.errors == 0
+        assert (await stored_user("1"))["username"] == "new"
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+import asyncio
+
+import server
+
+
+def counts(stats: server.ServerStats) -> dict:
+    return server.stats_counts(stats)
+
+
+def test_cold_partial_failure_keeps_the_calls_that_succeeded(fake_discord):
+    fake_discord.failing_buckets = {"guild-roles"}
+    cache = server.StatsCache(ttl=60, stale_ttl=60)
+
+    stats = asyncio.run(cache.get())
+    assert counts(stats) == {
+        "member_count": fake_discord.member_count, "online_count": fake_discord.member_count // 5,
+        "boost_count": 14, "channel_count": fake_discord.channel_count, "role_count": 0, "degraded": True,
+    }
+
+
+def test_partial_failure_keeps_previous_counts(fake_discord):
+    cache = server.StatsCache(ttl=0, stale_ttl=0)
+
+    async def scenario():
+        first = await cache.get()
+        fake_discord.failing_buckets = {"guild-channels"}
+        fake_discord.member_count += 1
+        return first, await cache.get()
+
+    first, second = asyncio.run(scenario())
+    assert not first.degraded
+    assert second.degraded
+    assert second.member_count == fake_discord.member_count
+    assert second.channel_count == first.channel_count == fake_discord.channel_count
+
+
+def test_total_failure_falls_back_to_degraded_zeros(fake_discord):
+    fake_discord.failing_buckets = {"guild", "guild-channels", "guild-roles"}
+    cache = server.StatsCache(ttl=60, stale_ttl=60)
+
+    stats = asyncio.run(cache.get())
+    assert counts(stats) == {
+        "member_count": 0, "online_count": 0, "boost_count": 0,
+        "channel_count": 0, "role_count": 0, "degraded": True,
+    }
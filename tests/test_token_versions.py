@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from fake_discord import ADMIN_ID
+
+
+@pytest.fixture
+def client(monkeypatch, fake_discord, db):
+    monkeypatch.setattr(server, "JWT_CLAIMS_MODE", True)
+    return TestClient(server.app)
+
+
+def login(client, code: str) -> dict:
+    response = client.get("/api/auth/callback", params={"code": code})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_token_reused_after_version_cache_expiry(client):
+    headers = login(client, "1")
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    server.token_versions.clear()
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+
+def test_token_of_user_without_token_version(client, db):
+    # Documents written before token versions existed have no token_version field
+    now = datetime.utcnow()
+    user = server.User(id="42", username="legacy", discriminator="0", joined_at=now, last_login=now)
+    asyncio.run(db.users.insert_one(user.model_dump()))
+    headers = {"Authorization": f"Bearer {server.create_access_token(user.id, user, 0)}"}
+
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+
+def test_deleted_user_token_rejected(client):
+    headers = login(client, "1")
+    admin = login(client, "admin")
+
+    assert client.delete("/api/users/100000000000000001", headers=admin).status_code == 200
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+    server.token_versions.clear()
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+    # Logging in again creates a new user whose versions tokens from before the deletion never carry
+    new_headers = login(client, "1")
+    assert client.get("/api/auth/me", headers=new_headers).status_code == 200
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+    server.token_versions.clear()
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+
+def test_demoted_admin_token_rejected(client, monkeypatch):
+    admin = login(client, "admin")
+    assert client.get("/api/admin/dashboard", headers=admin).status_code == 200
+
+    monkeypatch.setattr(server, "ADMIN_USER_IDS", [])
+    assert client.get("/api/auth/me", headers=admin).status_code == 401
+
+    # Logging in as a non-admin bumps the token version, so the old token stays revoked
+    demoted = login(client, "admin")
+    assert client.get("/api/auth/me", headers=demoted).json()["is_admin"] is False
+    monkeypatch.setattr(server, "ADMIN_USER_IDS", [ADMIN_ID])
+    assert client.get("/api/auth/me", headers=admin).status_code == 401
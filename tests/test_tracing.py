@@ -0,0 +1,65 @@
+import asyncio
+import logging
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import server
+
+
+async def chunks():
+    yield b"first\n"
+    yield b"second\n"
+
+
+def create_app() -> Starlette:
+    return Starlette(routes=[
+        Route("/json", lambda request: JSONResponse({"ok": True})),
+        Route("/export", lambda request: StreamingResponse(chunks(), media_type="application/x-ndjson")),
+        Route("/events", lambda request: StreamingResponse(chunks(), media_type="text/event-stream")),
+    ])
+
+
+@pytest.fixture
+def client():
+    return TestClient(server.TracingMiddleware(create_app(), log_threshold=0))
+
+
+@pytest.mark.parametrize("path, logged", [("/json", True), ("/export", False), ("/events", False)])
+def test_waterfalls_are_not_logged_for_streams(client, caplog, path, logged):
+    with caplog.at_level(logging.INFO, logger="server"):
+        response = client.get(path)
+
+    assert response.status_code == 200 and response.headers["x-trace-id"]
+    waterfalls = [record for record in caplog.records if response.headers["x-trace-id"] in record.getMessage()]
+    assert bool(waterfalls) is logged
+
+
+def test_exporter_stop_waits_for_the_export_in_progress():
+    received = []
+
+    async def collector(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.1)
+        received.append(request)
+        return httpx.Response(200)
+
+    exporter = server.TraceExporter(path=None, url="http://collector.test/v1/traces", interval=0.01, max_queue=100)
+
+    async def scenario():
+        exporter.start()
+        await exporter._http.aclose()
+        exporter._http = httpx.AsyncClient(transport=httpx.MockTransport(collector))
+        exporter.export([server.Span("0" * 32, None, "GET /api/stats", "server")])
+        await asyncio.sleep(0.05)
+        # The loop has taken the batch and is waiting on the collector
+        assert exporter.metrics()["queued"] == 0 and not received
+
+        await exporter.stop()
+
+    asyncio.run(scenario())
+    assert len(received) == 1
+    assert exporter.exported == 1 and exporter.errors == 0
@@ -0,0 +1,30 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+
+import server
+
+
+def export(fields, export_format) -> str:
+    async def collect():
+        return "".join([chunk async for chunk in server.iter_users_export(fields, export_format)])
+    return asyncio.run(collect())
+
+
+def test_csv_and_ndjson_agree(db):
+    joined_at = datetime(2024, 5, 1, 12, 30)
+    asyncio.run(db.users.insert_many([
+        {"id": "1", "username": "admin", "email": None, "is_admin": True, "joined_at": joined_at},
+        {"id": "2", "username": "member", "email": "member@example.com", "is_admin": False, "joined_at": joined_at},
+    ]))
+    fields = ["id", "email", "is_admin", "joined_at"]
+
+    rows = list(csv.DictReader(io.StringIO(export(fields, "csv"))))
+    lines = [json.loads(line) for line in export(fields, "ndjson").splitlines()]
+
+    assert [row["is_admin"] for row in rows] == ["false", "true"]
+    assert [json.dumps(line["is_admin"]) for line in lines] == ["false", "true"]
+    assert [row["email"] for row in rows] == ["member@example.com", ""]
+    assert rows[0]["joined_at"] == lines[0]["joined_at"] == "2024-05-01T12:30:00"